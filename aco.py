@@ -1,24 +1,149 @@
 #! /usr/bin/python3
+from array import array
 from bisect import bisect
-from collections import Counter
-from itertools import accumulate, starmap
-from random import choice, random
+from collections import namedtuple
+from itertools import accumulate, chain, starmap
+from math import log
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+from os import cpu_count
+from random import Random, random, randrange
+from time import perf_counter, time
+
+
+class PheromoneTrail:
+    """ The pheromone levels of every edge in a graph
+
+        Levels are held in one flat array of doubles indexed by edge id so
+        the whole trail can be copied, shared or swapped in a single step
+    """
+    def __init__(self):
+        self.levels = array('d')
+
+    def __len__(self):
+        return len(self.levels)
+
+    def reset(self):
+        """ Start afresh with every edge at the initial level """
+        self.levels = array('d', [1])*len(self.levels)
+
+    def wrap(self, edge):
+        """ Give an edge the next free slot in this trail """
+        self.levels.append(1)
+        return PheromoneWrapper(edge, self, len(self.levels)-1)
 
 
 class PheromoneWrapper:
     """ Add pheromone information to any object """
-    def __init__(self, wraps):
-        self.pheromones = 1
+    def __init__(self, wraps, trail, eid):
         self.wraps = wraps
+        self.trail = trail
+        self.eid = eid
+
+    @property
+    def pheromones(self):
+        return self.trail.levels[self.eid]
+
+    @pheromones.setter
+    def pheromones(self, value):
+        self.trail.levels[self.eid] = value
 
     def __getattr__(self, name):
+        if name == 'wraps':
+            # not yet set, eg. while unpickling
+            raise AttributeError(name)
         return getattr(self.wraps, name)
 
 
+PHASES = ('travel', 'simplify', 'deposit', 'evaporate', 'analysis')
+
+Stats = namedtuple('Stats', ['min', 'mean', 'max', 'count'])
+Stats.__doc__ = """ The spread of some quantity over a generation """
+
+
+def spread(values):
+    """ The Stats of values in a single pass, all 0 if there are none """
+    count, total, low, high = 0, 0, None, None
+    for v in values:
+        if count:
+            if v < low:
+                low = v
+            elif v > high:
+                high = v
+        else:
+            low = high = v
+        count += 1
+        total += v
+    return Stats(low, total/count, high, count) if count else Stats(0, 0, 0, 0)
+
+
+class GenerationSummary:
+    """ The statistics of a single generation, each worked out the first
+        time it is asked for
+
+        interest, distance, steps   Stats of the routes of the ants
+        pheromones                  Stats of the pheromone levels of every edge
+    """
+    statistics = ('interest', 'distance', 'steps', 'pheromones')
+
+    def __init__(self, graph, gen, ants):
+        self.graph, self.gen, self.ants = graph, gen, ants
+        self.computed = {}
+
+    def __getattr__(self, name):
+        if name not in GenerationSummary.statistics:
+            raise AttributeError(name)
+        if name not in self.computed:
+            self.computed[name] = getattr(self, 'find_'+name)()
+        return self.computed[name]
+
+    def find_interest(self):
+        return spread(a.interest for a in self.ants)
+
+    def find_distance(self):
+        return spread(a.age for a in self.ants)
+
+    def find_steps(self):
+        return spread(len(a.moves) for a in self.ants)
+
+    def find_pheromones(self):
+        trail = find_trail(self.graph)
+        if trail is None:
+            return spread(e.pheromones for _, _, e in self.graph.get_edges())
+        levels = trail.levels
+        if not levels:
+            return Stats(0, 0, 0, 0)
+        return Stats(min(levels), sum(levels)/len(levels), max(levels), len(levels))
+
+
+def analyse(analytics, graph, gen, ants, summary=None):
+    """ Call every analyser on a generation, returning what each gave
+
+        Analysers with a true summarised attribute are also given the
+        GenerationSummary, which is made once for all of them if summary
+        is not given, and dropped once the generation has been analysed
+    """
+    results = []
+    for an in analytics:
+        if getattr(an, 'summarised', False):
+            if summary is None:
+                summary = GenerationSummary(graph, gen, ants)
+            results.append(an(graph, gen, ants, summary))
+        else:
+            results.append(an(graph, gen, ants))
+    return results
+
+
 class Swarm:
-    """ A virtual swam of ants that will execute an ACO search over a graph """
+    """ A virtual swam of ants that will execute an ACO search over a graph
+
+        While searching, timings holds the seconds spent on each of PHASES
+        so far this generation, and steps the number of steps the ants took.
+        Ants are called to walk and simplify their routes in one go, so only
+        swarms that erase loops separately (eg. VectorSwarm) time simplify.
+    """
 
-    def __init__(self, size, max_age, max_tiredness, alpha, beta, evaporation, Ant):
+    def __init__(self, size, max_age, max_tiredness, alpha, beta, evaporation, Ant, seed=None, update=None):
         """ Set up the parameters of the search:
 
             size            number of ants in each generation
@@ -27,6 +152,10 @@ class Swarm:
             alpha, beta     parameters of the ACO local fitness function
             evaporation     how fast the deposited pheromones decay
             Ant             the class that the ants will be instantiated from
+            seed            seed for all random choices made by the ants,
+                            one is picked (and kept in seed) if not given
+            update          how the ants lay pheromones, every ant
+                            (AllAnts) if not given
         """
         self.max_age = max_age
         self.max_tiredness = max_tiredness
@@ -35,127 +164,417 @@ class Swarm:
         self.beta = beta
         self.Ant = Ant
         self.evaporation = evaporation
+        self.seed = seed if seed is not None else randrange(2**32)
+        self.update = update if update else AllAnts()
+        self.ants = []
 
     def setup_graph(self, graph):
-        return graph.transform(t_edge=PheromoneWrapper)
+        """ Give every edge of the graph a pheromone level
+
+            A graph that has already been set up keeps its edges and carries
+            on from the trail it already has
+        """
+        self.started = time()
+        self.generation = 0
+        self.best, self.improved, self.found_after = None, 0, None
+        self.timings, self.steps = dict.fromkeys(PHASES, 0.0), 0
+        self.update.setup(self)
+        self.trail = find_trail(graph)
+        if self.trail is not None:
+            return graph
+        self.trail = PheromoneTrail()
+        return graph.transform(t_edge=self.trail.wrap)
+
+    def route_choices(self, graph):
+        """ The onward choices for one generation, weighted as this swarm's ants weight them """
+        return RouteChoices(graph, self.Ant(None, self.max_age, self.max_tiredness, self.alpha, self.beta).evaluate_edge)
+
+    def population(self):
+        """ The ants of this swarm, along with the Random each rolls with
+
+            Made once and reused by every generation
+        """
+        if len(self.ants) != self.size:
+            self.ants = [(self.Ant(None, self.max_age, self.max_tiredness, self.alpha, self.beta), Random())
+                         for _ in range(self.size)]
+        return self.ants
 
     def run_generation(self, graph, starting_points):
         """ Run a single generation of ants over this graph """
-        for _ in range(self.size):
-            ant = self.Ant(choice(starting_points), self.max_age, self.max_tiredness, self.alpha, self.beta)
-            ant(graph)
+        choices = self.route_choices(graph)
+        generation, self.generation = self.generation, self.generation+1
+        timings = self.timings
+        for i, (ant, rng) in enumerate(self.population()):
+            ant_random(self.seed, generation, i, rng)
+            ant.reset(rng.choice(starting_points), rng)
+            started = perf_counter()
+            ant(graph, choices)
+            # an ant walks and simplifies in one call, so all of it counts as travel
+            timings['travel'] += perf_counter()-started
+            self.steps += len(ant.distances)-1
             yield ant
 
-    def __call__(self, graph, starting_points, rounds, *analytics):
+    def __call__(self, graph, starting_points, rounds, *analytics, stop=(), resume=None):
         """ Run a full search on this graph
 
             graph       the graph to be searched
-            rounds      how many generations of ants to use
+            rounds      how many generations of ants to use, including any
+                        already run by a resumed search
             analytics   an optional collection of Analysers that will be called
                         every round with the arguments (graph, i, ants)
                         where
                             graph = the current state of the graph
                             i     = the current generation
                             ants  = the final state of all ants for this generation
+                        and the GenerationSummary of the generation too if
+                        they are summarised, see analyse
+            stop        an optional collection of stopping rules that will be
+                        called after the analytics every round with the
+                        arguments (swarm, i, ants), the search ends early as
+                        soon as one returns True
+            resume      optionally called as resume(swarm, graph) once the
+                        graph is set up, to restore the state of an earlier
+                        search, eg. Checkpoint.restore
+
+            A KeyboardInterrupt also ends the search early, why the search
+            ended early is kept in stopped_by. deterministic is whether the
+            same search would end the same way again, False if it was
+            interrupted or stopped by a rule without a true deterministic
+            attribute, such as TimeLimit. Any analysers with a close method
+            are closed once the search is over.
 
             returns the final state of the graph
         """
+        self.stopped_by, self.deterministic = None, True
         graph = self.setup_graph(graph)
-        for i in range(rounds):
-            ants = list(self.run_generation(graph, starting_points))
-            self.deposit(graph, ants)
-            self.evaporate(graph)
+        if resume:
+            resume(self, graph)
+        try:
+            for i in range(self.generation, rounds):
+                timings = self.timings = dict.fromkeys(PHASES, 0.0)
+                self.steps = 0
+                ants = list(self.run_generation(graph, starting_points))
+                started = perf_counter()
+                self.track_best(ants)
+                self.deposit(graph, ants)
+                deposited = perf_counter()
+                self.evaporate(graph)
+                evaporated = perf_counter()
+                timings['deposit'] += deposited-started
+                timings['evaporate'] += evaporated-deposited
+                analyse(analytics, graph, i, ants)
+                timings['analysis'] += perf_counter()-evaporated
+                for rule in stop:
+                    if rule(self, i, ants):
+                        self.stopped_by = str(rule)
+                        self.deterministic = self.deterministic and getattr(rule, 'deterministic', False)
+                if self.stopped_by:
+                    break
+        except KeyboardInterrupt:
+            self.stopped_by, self.deterministic = "interrupted", False
+        finally:
             for an in analytics:
-                an(graph, i, ants)
+                if hasattr(an, 'close'):
+                    an.close()
         return graph
 
+    def track_best(self, ants):
+        """ Remember the Route of the best ant of the search so far, and the generation and time it was found """
+        for ant in ants:
+            score = ant.evaluate_route()
+            if self.best is None or score > self.best.evaluate_route():
+                self.best, self.improved = Route(ant, score), self.generation
+                self.found_after = time()-self.started
+
     def deposit(self, graph, ants):
         """ Update the graph with the pheromone trails from these ants """
-        for ant in ants:
-            deposition = ant.evaluate_route()
-            for a, b in ant:
-                for edge in graph.get_edges(a, b):
-                    edge.pheromones += deposition
+        self.update.deposit(self, ants)
 
     def evaporate(self, graph):
         """ Allow the current pheromone trails to decay """
-        for _, _, edge in graph.get_edges():
-            edge.pheromones *= self.evaporation
+        levels = self.trail.levels
+        for eid in range(len(levels)):
+            levels[eid] *= self.evaporation
+        self.update.bound(self)
+
+
+class AllAnts:
+    """ Every ant lays pheromone on its route in proportion to its score
+
+        The base of the pheromone update strategies, which are called with
+        the swarm so they can reach its trail, best ant and generation
+    """
+    def setup(self, swarm):
+        """ Called at the start of every search """
+        pass
+
+    def deposit(self, swarm, ants):
+        """ Lay the pheromones for this generation """
+        for ant in ants:
+            lay(swarm.trail.levels, ant, ant.evaluate_route())
+
+    def bound(self, swarm):
+        """ Called after the trail has evaporated """
+        pass
+
+
+class BestOfGeneration(AllAnts):
+    """ Only the best ant of each generation lays pheromone """
+    def deposit(self, swarm, ants):
+        if ants:
+            best = max(ants, key=lambda a: a.evaluate_route())
+            lay(swarm.trail.levels, best, best.evaluate_route())
+
+
+class Elitist(AllAnts):
+    """ Every ant lays pheromone, and the best route of the search so far
+        is reinforced as if weight more ants had taken it
+    """
+    def __init__(self, weight=5):
+        self.weight = weight
+
+    def deposit(self, swarm, ants):
+        super().deposit(swarm, ants)
+        if swarm.best is not None:
+            lay(swarm.trail.levels, swarm.best, self.weight*swarm.best.evaluate_route())
+
+
+class RankBased(AllAnts):
+    """ Only the best ranks-1 ants of each generation lay pheromone, weighted
+        by rank, along with the best route so far weighted by ranks
+    """
+    def __init__(self, ranks=6):
+        self.ranks = ranks
+
+    def deposit(self, swarm, ants):
+        ranked = sorted(ants, key=lambda a: a.evaluate_route(), reverse=True)[:self.ranks-1]
+        for rank, ant in enumerate(ranked, 1):
+            lay(swarm.trail.levels, ant, (self.ranks-rank)*ant.evaluate_route())
+        if swarm.best is not None:
+            lay(swarm.trail.levels, swarm.best, self.ranks*swarm.best.evaluate_route())
+
+
+class MaxMin(BestOfGeneration):
+    """ MAX-MIN Ant System
+
+        Only the best ant of each generation lays pheromone, and every level
+        is kept between an upper bound (the level the best route so far would
+        settle at if it were laid every generation) and a fraction of it.
+        If the best route has not improved for a while every level is put
+        back to the upper bound to restart the exploration.
+
+        Levels that never evaporate have no upper bound, so the swarm must
+        keep less than all of the trail every generation (evaporation < 1).
+        Until a route scores above 0 the bounds would be 0 too, leaving the
+        ants nothing to choose by, so levels are left unbounded until then.
+    """
+    def __init__(self, ratio=0.05, restart=10):
+        """ ratio       lower bound as a fraction of the upper bound
+            restart     generations without a better route before restarting
+        """
+        self.ratio = ratio
+        self.restart = restart
+
+    def setup(self, swarm):
+        if swarm.evaporation >= 1:
+            raise ValueError("max-min updates need an evaporation below 1")
+        self.restarted = 0
+
+    def bound(self, swarm):
+        if swarm.best is None or swarm.best.evaluate_route() <= 0:
+            return
+        highest = swarm.best.evaluate_route()/(1-swarm.evaporation)
+        lowest = highest*self.ratio
+        levels = swarm.trail.levels
+        if swarm.generation - max(swarm.improved, self.restarted) > self.restart:
+            self.restarted = swarm.generation
+            swarm.trail.levels = array('d', [highest])*len(levels)
+            return
+        for eid, level in enumerate(levels):
+            if level > highest:
+                levels[eid] = highest
+            elif level < lowest:
+                levels[eid] = lowest
+
+
+UPDATES = {'all': AllAnts, 'best': BestOfGeneration, 'elitist': Elitist, 'rank': RankBased, 'maxmin': MaxMin}
+
+
+class Stagnation:
+    """ Stop once the best route of a generation has not improved for a while """
+    deterministic = True
+
+    def __init__(self, patience):
+        """ patience    how many generations to wait for a better route """
+        self.patience = patience
+        self.best = None
+        self.waited = 0
+
+    def __call__(self, swarm, gen, ants):
+        best = max((a.evaluate_route() for a in ants), default=0)
+        if self.best is None or best > self.best:
+            self.best, self.waited = best, 0
+        else:
+            self.waited += 1
+        return self.waited >= self.patience
+
+    def __str__(self):
+        return "no better route for {} generations".format(self.waited)
+
+
+class Converged:
+    """ Stop once the pheromone trail has settled on a few edges
+
+        Measured by the entropy of the trail scaled by the number of edges,
+        1 when every edge is equally marked and 0 when one edge holds it all
+    """
+    deterministic = True
+
+    def __init__(self, entropy):
+        """ entropy     the level to stop below """
+        self.entropy = entropy
+        self.level = None
+
+    def __call__(self, swarm, gen, ants):
+        self.level = trail_entropy(swarm.trail.levels)
+        return self.level < self.entropy
+
+    def __str__(self):
+        return "pheromone entropy fell to {:.3f}".format(self.level)
+
+
+class TimeLimit:
+    """ Stop once the search has run for a set time
+
+        Only checked between generations, so a search can overrun by up to
+        the time one generation takes. When it stops depends on how fast the
+        search runs, so it is not deterministic.
+    """
+    deterministic = False
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __call__(self, swarm, gen, ants):
+        return time()-swarm.started >= self.seconds
+
+    def __str__(self):
+        return "ran out of time after {}s".format(self.seconds)
 
 
 class BasicAnt:
-    """ A single ant to be used in an ACO search """
-    def __init__(self, position, max_age, max_tiredness, alpha, beta):
+    """ A single ant to be used in an ACO search
+
+        A swarm reuses its ants from one generation to the next (see reset),
+        so anything kept beyond the generation it was made in should be a copy
+    """
+    __slots__ = ['moves', 'edges', 'distances', 'interests', 'max_age', 'max_tiredness',
+                 'alpha', 'beta', 'age', 'interest', 'roll']
+
+    def __init__(self, position, max_age, max_tiredness, alpha, beta, rng=None):
         """ Set the paramiters of this ant for this search
 
             position        starting position of the ant
             max_age         maximum distance each ant can travel
             max_tiredness   how far an ant can go without resting
             alpha, beta     parameters of the ACO local fitness function
+            rng             the Random this ant rolls its choices with,
+                            the random module if not given
         """
-        self.moves = [position]
         self.max_age = max_age
         self.max_tiredness = max_tiredness
         self.alpha = alpha
         self.beta = beta
+        self.moves = []
+        self.edges = array('l')
+        self.distances = array('d')
+        self.interests = array('d')
+        self.reset(position, rng)
+
+    def reset(self, position, rng=None):
+        """ Start a new journey from position, reusing the buffers of the last one """
+        del self.moves[:], self.edges[:], self.distances[:], self.interests[:]
+        self.moves.append(position)
+        self.distances.append(0)
+        self.interests.append(0)
         self.age = 0
         self.interest = 0
+        self.roll = rng.random if rng else random
+
+    def copy(self):
+        """ A Route of the route taken, that will not change when this ant is reused """
+        return Route(self)
 
-    def __call__(self, graph):
-        """ Search the graph and then work out the simplest version of this route"""
-        self.travel(graph)
-        self.moves = self.simplify_journy(self.moves)
-        self.age = sum(graph.get_edges(a, b)[0].cost_out for a, b in self)
-        self.interest = sum(graph.get_edges(a, b)[0].interest+graph[a].interest for a, b in self)
+    def __call__(self, graph, choices=None):
+        """ Search the graph and then work out the simplest version of this route
 
-    def travel(self, graph):
+            choices     RouteChoices shared by this ant's generation, if not
+                        given the ant weights its own choices
+        """
+        self.travel(choices if choices else RouteChoices(graph, self.evaluate_edge))
+        self.simplify()
+
+    def travel(self, choices):
         """ Walk the graph until too tired
 
             while the journey is less than max_age long and this ant has rested recently enough
                 make a random choice of where to go next
                 this choice is weighted by local and pheromone interest
                 and excludes returning to the previous node
+
+            Every move records the id of the edge taken, and running totals
+            of distance and interest so far in distances and interests
         """
         try:
-            age, tiredness = 0, 0
+            age, tiredness, interest = 0, 0, 0
             last = None
+            here = choices.graph[self.moves[-1]]
             while age < self.max_age and tiredness < self.max_tiredness:
-                nid, node, edge = self.pick_next(graph, last, self.moves[-1])
+                nid, node, edge = self.pick_next(choices, last, self.moves[-1])
                 age += edge.cost_out
+                interest += edge.interest+here.interest
                 tiredness = 0 if edge.rest or node.rest else tiredness+edge.cost_out
-                last = self.moves[-1]
+                last, here = self.moves[-1], node
                 self.moves.append(nid)
+                self.edges.append(edge.eid)
+                self.distances.append(age)
+                self.interests.append(interest)
         except IndexError:
             pass
 
-    def pick_next(self, graph, last, current):
+    def __getstate__(self):
+        """ Only keep the final route when pickled """
+        state = dict(getattr(self, '__dict__', {}))
+        state.update((name, getattr(self, name)) for name in BasicAnt.__slots__
+                     if name not in ('roll', 'distances', 'interests'))
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self.distances, self.interests = array('d'), array('d')
+        self.roll = random
+
+    def pick_next(self, choices, last, current):
         """ Make a biased random choice of all onwards nodes for the current position"""
-        valid_choices = [(to, graph[to], e) for to, e in graph.get_edges(current) if to != last]
-        choice = biased_random(starmap(self.evaluate_edge, valid_choices))
-        return valid_choices[choice]
+        return choices.pick(current, last, self.roll())
+
+    def simplify(self):
+        """ Remove loops from the trip, taking their length and interest off the totals """
+        kept = list(erase_loops(self.moves))
+        self.age = self.distances[-1] - sum(self.distances[l]-self.distances[f] for f, l in kept)
+        self.interest = self.interests[-1] - sum(self.interests[l]-self.interests[f] for f, l in kept)
+        # each kept index is at or after the slot it moves down to, so compact in place
+        moves, edges = self.moves, self.edges
+        for i, (f, l) in enumerate(kept):
+            moves[i] = moves[f]
+            if i < len(kept)-1:
+                edges[i] = edges[l]
+        del moves[len(kept):], edges[len(kept)-1:]
 
     def simplify_journy(self, moves):
-        """ Naively remove loops from the trip """
-        node_visits = Counter(moves)
-        while node_visits.most_common(1)[0][1] > 1:
-            skipping_till = None
-            loopless = []
-            for n in moves:
-                if not skipping_till:
-                    if node_visits[n] > 1:
-                        skipping_till = n
-                    else:
-                        loopless.append(n)
-                else:
-                    if n == skipping_till:
-                        loopless.append(n)
-                        skipping_till = None
-                        node_visits[n] -= 2
-                    else:
-                        node_visits[n] -= 1
-            moves = loopless
-            node_visits = Counter(moves)
-        return moves
+        """ Remove loops from the trip """
+        return [moves[f] for f, _ in erase_loops(moves)]
 
     def __iter__(self):
         """ every move taken by this ant so far as (from, to) """
@@ -178,6 +597,234 @@ class BasicAnt:
         return edge.pheromones**self.alpha * local_interest**self.beta
 
 
+class Route:
+    """ An unchanging snapshot of the route an ant took, which can stand in
+        for the ant wherever only its route is needed
+
+        score       the score of the route as given by evaluate_route
+        moves       the ids of the nodes along the route
+        edges       the ids of the edges along the route
+        age         length of the route
+        interest    interest along the route
+    """
+    __slots__ = ['score', 'moves', 'edges', 'age', 'interest']
+
+    def __init__(self, ant, score=None):
+        self.score = ant.evaluate_route() if score is None else score
+        self.moves = tuple(ant.moves)
+        self.edges = tuple(ant.edges)
+        self.age = ant.age
+        self.interest = ant.interest
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in Route.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def __eq__(self, other):
+        return isinstance(other, Route) and self.moves == other.moves and self.score == other.score
+
+    def __hash__(self):
+        return hash(self.moves)
+
+    def __iter__(self):
+        """ every move taken along this route as (from, to) """
+        return zip(self.moves, self.moves[1:])
+
+    def evaluate_route(self):
+        return self.score
+
+    def copy(self):
+        return self
+
+
+class RouteChoices:
+    """ The weighted onward choices from every node for a single generation
+
+        Pheromones only change between generations, so the choices from a
+        node are weighted the first time any ant reaches it and reused by
+        every later visit. For each previous node the choices leading straight
+        back to it are dropped and the rest kept as cumulative weights, so a
+        step is one bisect over a prebuilt list.
+    """
+    def __init__(self, graph, evaluate):
+        """ evaluate    called as evaluate(next_id, next_node, edge) to weight a choice """
+        self.graph = graph
+        self.evaluate = evaluate
+        self.weighted = {}
+        self.tables = {}
+
+    def table(self, current, last):
+        """ The (choices, cumulative weights) from current when arriving from last """
+        if current not in self.weighted:
+            choices = [(to, self.graph[to], e) for to, e in self.graph.get_edges(current)]
+            self.weighted[current] = choices, list(starmap(self.evaluate, choices))
+            self.tables[current] = {}
+        choices, weights = self.weighted[current]
+        keep = [i for i, (to, _, _) in enumerate(choices) if to != last]
+        table = [choices[i] for i in keep], list(accumulate(weights[i] for i in keep))
+        self.tables[current][last] = table
+        return table
+
+    def pick(self, current, last, roll):
+        """ Make a biased choice of the onward moves using a roll in [0, 1)
+
+            raises IndexError if there are no onward moves
+        """
+        try:
+            choices, cumulative = self.tables[current][last]
+        except KeyError:
+            choices, cumulative = self.table(current, last)
+        roll *= cumulative[-1]
+        return choices[bisect(cumulative, roll) if roll else 0]
+
+
+class ParallelSwarm(Swarm):
+    """ A swarm that spreads the ants of each generation over a process pool
+
+        Every worker holds its own copy of the graph, and reads the pheromone
+        levels from a snapshot in shared memory that is refreshed once per
+        generation. Ants draw from the same random streams as they would in
+        a Swarm, so a search gives the same routes for a given seed whatever
+        the number of workers.
+    """
+    def __init__(self, size, max_age, max_tiredness, alpha, beta, evaporation, Ant, seed=None, update=None, workers=None):
+        """ As Swarm, plus:
+
+            workers     number of worker processes (default one per core)
+        """
+        super().__init__(size, max_age, max_tiredness, alpha, beta, evaporation, Ant, seed, update)
+        self.workers = workers if workers else cpu_count()
+        self.pool = None
+        self.snapshot = None
+
+    def setup_graph(self, graph):
+        graph = super().setup_graph(graph)
+        self.close()
+        self.snapshot = SharedMemory(create=True, size=max(1, len(self.trail))*self.trail.levels.itemsize)
+        params = (self.max_age, self.max_tiredness, self.alpha, self.beta, self.Ant)
+        self.pool = Pool(self.workers, _init_worker, (graph, self.trail, self.snapshot.name, params))
+        return graph
+
+    def shares(self):
+        """ How many ants each worker runs every generation """
+        return [self.size//self.workers + (1 if i < self.size%self.workers else 0) for i in range(self.workers)]
+
+    def run_generation(self, graph, starting_points):
+        """ Run a single generation of ants over this graph using the pool """
+        levels = memoryview(self.trail.levels).cast('B')
+        self.snapshot.buf[:len(levels)] = levels
+        shares = self.shares()
+        firsts = accumulate([0]+shares)
+        jobs = [(self.seed, self.generation, first, n, starting_points) for first, n in zip(firsts, shares) if n]
+        self.generation += 1
+        started = perf_counter()
+        results = chain.from_iterable(self.pool.map(_run_ants, jobs))
+        # the workers walk and simplify together, so all of it counts as travel
+        self.timings['travel'] += perf_counter()-started
+        for (route, edges, age, interest), (ant, _) in zip(results, self.population()):
+            ant.reset(route[0])
+            ant.moves[:] = route
+            ant.edges[:] = edges
+            ant.age = age
+            ant.interest = interest
+            self.steps += len(edges)
+            yield ant
+
+    def __call__(self, graph, starting_points, rounds, *analytics, **options):
+        try:
+            return super().__call__(graph, starting_points, rounds, *analytics, **options)
+        finally:
+            self.close()
+
+    def close(self):
+        """ Shut down the worker pool and release the shared snapshot """
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        if self.snapshot is not None:
+            self.snapshot.close()
+            self.snapshot.unlink()
+            self.snapshot = None
+
+
+_worker = {}
+
+
+def _init_worker(graph, trail, snapshot, params):
+    """ Point this worker's copy of the trail at the shared snapshot """
+    _worker['snapshot'] = SharedMemory(snapshot)
+    trail.levels = _worker['snapshot'].buf.cast('d')[:len(trail)]
+    _worker['graph'] = graph
+    _worker['params'] = params
+
+
+def _run_ants(job):
+    """ Run one worker's share of a generation, returning (moves, edge ids, age, interest) for each ant """
+    seed, generation, first, count, starting_points = job
+    max_age, max_tiredness, alpha, beta, Ant = _worker['params']
+    choices = RouteChoices(_worker['graph'], Ant(None, max_age, max_tiredness, alpha, beta).evaluate_edge)
+    ant, rng = Ant(None, max_age, max_tiredness, alpha, beta), Random()
+    results = []
+    for i in range(first, first+count):
+        ant_random(seed, generation, i, rng)
+        ant.reset(rng.choice(starting_points), rng)
+        ant(_worker['graph'], choices)
+        results.append((tuple(ant.moves), array('l', ant.edges), ant.age, ant.interest))
+    return results
+
+
+def lay(levels, ant, deposition):
+    """ Add pheromone along every edge of an ant's route """
+    for eid in ant.edges:
+        levels[eid] += deposition
+
+
+def find_trail(graph):
+    """ The pheromone trail a graph has been set up with, None if it has not been """
+    for nid in graph:
+        for _, edge in graph.get_edges(nid):
+            return edge.trail if isinstance(edge, PheromoneWrapper) else None
+    return None
+
+
+def ant_random(seed, generation, index, rng=None):
+    """ The independent random stream for one ant of one generation of a search
+
+        rng     an existing Random to reseed, rather than making a new one
+    """
+    rng = rng if rng else Random()
+    rng.seed("{}-{}-{}".format(seed, generation, index))
+    return rng
+
+
+def erase_loops(moves):
+    """ Walk a route once, jumping from each node straight past the last time
+        the route visited it
+
+        yields (first, last) the indexes of the first and last visit to each
+        node kept on the loop-free route
+    """
+    last_visit = {n: i for i, n in enumerate(moves)}
+    i = 0
+    while i < len(moves):
+        last = last_visit[moves[i]]
+        yield i, last
+        i = last + 1
+
+
+def trail_entropy(levels):
+    """ Entropy of the pheromone levels scaled into [0, 1] by the number of levels """
+    total = sum(levels)
+    if len(levels) < 2 or total <= 0:
+        return 0
+    spread = log(total) - sum(l*log(l) for l in levels if l > 0)/total
+    return spread/log(len(levels))
+
+
 def biased_random(chances):
     """ Makes use of pattern from http://docs.python.com/3.3/library/random """
     cumulative_dis = list(accumulate(chances))
@@ -1,13 +1,26 @@
+from collections import deque
 import csv
+import heapq
 
+from aco import PHASES, GenerationSummary, Route, analyse, find_trail, spread
+
+
+COSTS = ('free', 'ants', 'graph')
 
 class StubAnaliser:
     """ Provide basic functionality of a full analyser
 
         if this is to be used with CSVWrapper or similar
         it must return the same length list whenever row_headers
-        and __call__ are called
+        and __call__ are called, or None when it has skipped a generation
+
+        cost is how the work of each call grows, one of COSTS:
+            free    a fixed amount
+            ants    with the number and length of routes
+            graph   with the size of the graph
     """
+    cost = 'free'
+
     def __init__(self, graph):
         """ Initialise with the graph that will be analysed by this"""
         pass
@@ -39,24 +52,102 @@ class StubAnaliser:
         """ A displayable summary string of this analysis"""
         return "{}".format(self.result())
 
+    def close(self):
+        """ Release anything held, called once the search is over """
+        pass
+
+
+class CSVSink:
+    """ Write rows to a CSV file, a batch at a time
+
+        filename    the name of the file to write
+        buffer      how many rows to hold before writing them out
+    """
+    def __init__(self, filename, buffer=100):
+        self.file = open(filename, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.buffer = buffer
+        self.rows = []
+
+    def writerow(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.buffer:
+            self.flush()
+
+    def flush(self):
+        self.writer.writerows(self.rows)
+        self.rows = []
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+class NPZSink:
+    """ Keep rows in memory and save them as one column per header in a
+        NumPy .npz file when closed, blank cells are saved as NaN
+
+        needs NumPy, though only once it is closed
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.headers = None
+        self.rows = []
+
+    def writerow(self, row):
+        if self.headers is None:
+            self.headers = row
+        else:
+            self.rows.append([float('nan') if c in ('', None) else c for c in row])
+
+    def close(self):
+        if self.headers is None:
+            return
+        import numpy
+        columns = list(zip(*self.rows)) if self.rows else [()]*len(self.headers)
+        numpy.savez(self.filename, **{h: numpy.array(c, dtype=float) for h, c in zip(self.headers, columns)})
+        self.headers = None
+
+
+def open_sink(filename):
+    """ A sink for rows of results, chosen by the extension of filename """
+    return NPZSink(filename) if filename.endswith('.npz') else CSVSink(filename)
+
 
 class CSVWrapper(StubAnaliser):
     """ Wraps a collection of analysers and outputs there results to a CSV file
 
-        filename        the name of the file to save the CSV data to
+        filename        the name of the file to save the CSV data to, or a
+                        .npz file to save a column of numbers per header
         stubanalysers   analysis callables expected to provide at least
                         an extra row_headers() method
 
         Whenever this is called each of the subanalysers is also called
-        and a row is written to the CSV file containing the results
+        and a row is written to the CSV file containing the results. Each
+        row is held back until the next, so results a Scheduled analyser
+        only gives for the final generation when closed are filled in.
     """
+    summarised = True
+
     def __init__(self, filename, subanalysers):
-        self.sink = csv.writer(open(filename, 'w'))
+        self.sink = open_sink(filename)
         self.analysers = subanalysers
         self.sink.writerow([h for a in self.analysers for h in a.row_headers()])
+        self.pending = None
 
-    def __call__(self, graph, gen, ants):
-        self.sink.writerow([c for a in self.analysers for c in a(graph, gen, ants)])
+    def __call__(self, graph, gen, ants, summary=None):
+        self.write()
+        self.pending = gen, analyse(self.analysers, graph, gen, ants, summary)
+
+    def write(self):
+        """ Write out the row held back, if there is one """
+        if self.pending is not None:
+            _, cells = self.pending
+            self.sink.writerow([c for a, cs in zip(self.analysers, cells)
+                                for c in (cs if cs is not None else [''] * len(a.row_headers()))])
+            self.pending = None
 
     def __bool__(self):
         return any(self.analysers)
@@ -74,9 +165,66 @@ class CSVWrapper(StubAnaliser):
                     pass
 
     def close(self):
+        for a in self.analysers:
+            if hasattr(a, 'close'):
+                a.close()
+        if self.pending is not None:
+            gen, cells = self.pending
+            for i, a in enumerate(self.analysers):
+                final = getattr(a, 'final', None)
+                if cells[i] is None and final is not None and final[0] == gen:
+                    cells[i] = final[1]
+        self.write()
         self.sink.close()
 
 
+class Instrumentation(StubAnaliser):
+    """ Reports how fast the swarm is searching
+
+        Reports
+            Seconds spent on each of aco.PHASES this generation
+            Ants simplified per second of travel and simplification
+            Steps taken per second of travel
+
+        The analysis time is that of the generation before, as this
+        generation's analysis is not over when this is called
+    """
+    def __init__(self, swarm):
+        self.swarm = swarm
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self.ants, self.steps, self.previous = 0, 0, None
+
+    def row_headers(self):
+        return [phase+" seconds" for phase in PHASES]+["Ants/sec", "Steps/sec"]
+
+    def __call__(self, graph, gen, ants):
+        # the swarm starts a new timings for every generation, so the last one is complete by now
+        timings = dict(self.swarm.timings, analysis=self.previous['analysis'] if self.previous else 0.0)
+        self.previous = self.swarm.timings
+        for phase, seconds in timings.items():
+            self.totals[phase] += seconds
+        self.ants += len(ants)
+        self.steps += self.swarm.steps
+        walking = timings['travel']+timings['simplify']
+        return [timings[phase] for phase in PHASES]+[
+            len(ants)/walking if walking else None,
+            self.swarm.steps/timings['travel'] if timings['travel'] else None]
+
+    def close(self):
+        if self.previous:
+            self.totals['analysis'] += self.previous['analysis']
+            self.previous = None
+
+    def result(self):
+        return self.totals
+
+    def __str__(self):
+        walking = self.totals['travel']+self.totals['simplify']
+        return "\n".join(["{:>10} {:8.3f}s".format(phase, seconds) for phase, seconds in self.totals.items()]+[
+            "{:.0f} ants/sec, {:.0f} steps/sec".format(self.ants/walking if walking else 0,
+                                                       self.steps/self.totals['travel'] if self.totals['travel'] else 0)])
+
+
 class TrackNodeVisits(StubAnaliser):
     """ Tracks and reports
 
@@ -84,6 +232,8 @@ class TrackNodeVisits(StubAnaliser):
             The number of nodes that have ever been visited
             The total number of nodes in the graph (for context)
     """
+    cost = 'ants'
+
     def __init__(self, graph):
         self.nodes_visited = {nid:0 for nid in graph}
 
@@ -116,19 +266,31 @@ class StatisticalAnalyser(StubAnaliser):
             Minimum single value
             Average value
             Maximum single value
+
+        Analysers named after one of the statistics of GenerationSummary
+        are summarised, reading it from the summary the swarm shares with
+        every analyser of the generation, any others examine the
+        generation once themselves
     """
+    cost = 'ants'
+
+    @property
+    def summarised(self):
+        return self.name in GenerationSummary.statistics
+
     def row_headers(self):
         return ["Min "+self.name, "Average "+self.name, "Max "+self.name]
 
     def examine(self, ants, graph):
-        raise NotImplimentedError()
+        raise NotImplementedError()
 
-    def __call__(self, graph, gen, ants):
-        mi = min(self.examine(ants, graph))
-        a = sum(self.examine(ants, graph))/sum(1 for _ in self.examine(ants, graph))
-        m = max(self.examine(ants, graph))
-        print("Average "+self.name, a)
-        return [mi, a, m]
+    def __call__(self, graph, gen, ants, summary=None):
+        if self.summarised:
+            stats = getattr(summary if summary else GenerationSummary(graph, gen, ants), self.name)
+        else:
+            stats = spread(self.examine(ants, graph))
+        print("Average "+self.name, stats.mean)
+        return [stats.min, stats.mean, stats.max]
 
 
 class PheromoneConcentration(StatisticalAnalyser):
@@ -138,11 +300,31 @@ class PheromoneConcentration(StatisticalAnalyser):
             Minimum single concentration
             Average level
             Maximum single concentration
+
+        sample  the fraction of edges to look at, every edge if 1
     """
     name = "pheromones"
+    cost = 'graph'
+
+    def __init__(self, graph, sample=1):
+        if not 0 < sample <= 1:
+            raise ValueError("sample must be more than 0 and at most 1")
+        self.stride = max(1, round(1/sample))
+
+    @property
+    def summarised(self):
+        return self.stride == 1
+
+    def __call__(self, graph, gen, ants, summary=None):
+        if self.stride == 1:
+            return super().__call__(graph, gen, ants, summary)
+        trail = find_trail(graph)
+        stats = spread(trail.levels[::self.stride] if trail is not None else self.examine(ants, graph))
+        print("Average "+self.name, stats.mean)
+        return [stats.min, stats.mean, stats.max]
 
     def examine(self, ants, graph):
-        for _, _, e in graph.get_edges():
+        for _, _, e in graph.get_edges()[::self.stride]:
             yield e.pheromones
 
 
@@ -201,28 +383,141 @@ class StepsTaken(StatisticalAnalyser):
 
 def GraphOverview(graph):
     """ Provide some basic information on the graph about to be searched"""
-    print(graph)
-    print("Rest edges", sum(1 for _, _, e in graph.get_edges() if e.rest))
-    print("Rest nodes", sum(1 for n in graph if graph.get_node(n).rest))
-    print("Interesting edges", sum(1 for _, _, e in graph.get_edges() if e.interest))
-    print("Interesting nodes", sum(1 for n in graph if graph.get_node(n).interest))
+    edges, rest_edges, interesting_edges, longest = 0, 0, 0, None
+    for _, _, e in graph.get_edges():
+        edges += 1
+        rest_edges += 1 if e.rest else 0
+        interesting_edges += 1 if e.interest else 0
+        longest = e.cost_out if longest is None or e.cost_out > longest else longest
+    nodes = [graph.get_node(n) for n in graph]
+    print("Graph with {} nodes and {} edges".format(len(nodes), edges))
+    print("Rest edges", rest_edges)
+    print("Rest nodes", sum(1 for n in nodes if n.rest))
+    print("Interesting edges", interesting_edges)
+    print("Interesting nodes", sum(1 for n in nodes if n.interest))
     print("Connected components", graph.connected_components())
-    print("Longest edge", max(e.cost_out for _, _, e in graph.get_edges()))
+    print("Longest edge", longest)
+
+GraphOverview.cost = 'graph'
+
+
+class Scheduled(StubAnaliser):
+    """ Run an analyser only on some generations, and on a sample of the ants
+
+        analyser    the analyser to run
+        every       run on every this many generations, counting from the
+                    first, or only on the first and last if None
+        last        the index of the last generation of the search, if known
+        sample      the fraction of the ants to show the analyser
+
+        Skipped generations return None, which CSVWrapper fills with blanks.
+        A search can end before last, so if the final generation reached
+        was skipped the analyser is run on it when this is closed, leaving
+        its results in final as (generation, results).
+    """
+    def __init__(self, analyser, every=1, last=None, sample=1):
+        if not 0 < sample <= 1:
+            raise ValueError("sample must be more than 0 and at most 1")
+        self.analyser = analyser
+        self.every = every
+        self.last = last
+        self.stride = max(1, round(1/sample))
+        self.cost = getattr(analyser, 'cost', 'free')
+        self.skipped = None
+        self.final = None
+
+    def due(self, gen):
+        """ If the analyser runs on this generation """
+        return gen == 0 or gen == self.last or (self.every is not None and gen % self.every == 0)
+
+    @property
+    def summarised(self):
+        # a summary of every ant does not stand for a sample of them
+        return self.stride == 1 and getattr(self.analyser, 'summarised', False)
+
+    def row_headers(self):
+        return self.analyser.row_headers()
+
+    def __call__(self, graph, gen, ants, summary=None):
+        if not self.due(gen):
+            self.skipped = graph, gen, ants
+            return None
+        self.skipped = None
+        return self.run(graph, gen, ants, summary)
+
+    def run(self, graph, gen, ants, summary=None):
+        if self.stride > 1:
+            ants, summary = ants[::self.stride], None
+        return analyse([self.analyser], graph, gen, ants, summary)[0]
+
+    def result(self):
+        return self.analyser.result()
+
+    def close(self):
+        if self.skipped is not None:
+            graph, gen, ants = self.skipped
+            self.skipped = None
+            self.final = gen, self.run(graph, gen, ants)
+        if hasattr(self.analyser, 'close'):
+            self.analyser.close()
+
+    def __bool__(self):
+        return bool(self.analyser)
+
+    def __str__(self):
+        return str(self.analyser)
 
 
 class PreserveBest(StubAnaliser):
     """ Remember the best routs found during this search
 
-        x   number of best ants to preserve every generation
-        y   number of best ant overall to preserve
+        x       number of best ants to preserve every generation
+        y       number of best ant overall to preserve
+        history how many of the latest generations to keep the best ants
+                of in best_by_gen, every generation if None
+
+        Routes are kept as Route snapshots, best last, and a route is only
+        kept once however many ants take it. Each ant is scored once and
+        only the best few distinct routes of each generation are copied.
     """
-    def __init__(self, graph, x=3, y=3):
-        self.best = []
-        self.best_by_gen = []
+    cost = 'ants'
+
+    def __init__(self, graph, x=3, y=3, history=10):
+        self.kept = []
+        self.kept_moves = set()
+        self.added = 0
+        self.best_by_gen = deque(maxlen=history)
         self.x = x
-        self.y = x
+        self.y = y
+
+    @property
+    def best(self):
+        """ The best y distinct routes so far, best last """
+        return [route for _, _, route in sorted(self.kept)]
 
     def __call__(self, graph, gen, ants):
-        gen_best = sorted(ants, key=lambda b:b.evaluate_route())
-        self.best = sorted(self.best+gen_best, key=lambda b:b.evaluate_route())[-1*self.y:]
-        self.best_by_gen.append(gen_best[-1*self.x:])
+        # (score, index) of the first of the best ants taking each route
+        distinct = {}
+        for i, a in enumerate(ants):
+            score, moves = a.evaluate_route(), tuple(a.moves)
+            if moves not in distinct or score > distinct[moves][0]:
+                distinct[moves] = score, i
+        scored = heapq.nlargest(max(self.x, self.y), distinct.values())
+        gen_best = [Route(ants[i], score) for score, i in reversed(scored)]
+        for route in gen_best:
+            self.keep(route)
+        self.best_by_gen.append(gen_best[max(0, len(gen_best)-self.x):])
+
+    def keep(self, route):
+        """ Add route to the best overall, if it is good enough and not already there """
+        if len(self.kept) >= self.y and (not self.kept or route.score <= self.kept[0][0]):
+            return
+        if route.moves in self.kept_moves:
+            return
+        self.added += 1
+        self.kept_moves.add(route.moves)
+        if len(self.kept) < self.y:
+            heapq.heappush(self.kept, (route.score, self.added, route))
+        else:
+            _, _, dropped = heapq.heapreplace(self.kept, (route.score, self.added, route))
+            self.kept_moves.discard(dropped.moves)
@@ -0,0 +1,138 @@
+""" Run many route searches over one loaded graph
+
+    The graph is handed to a pool of worker processes once, each worker sets
+    it up with a pheromone trail once, and every request searched by that
+    worker starts from a fresh trail on the same edges.
+"""
+from collections import namedtuple
+from multiprocessing import Pool
+from time import time
+
+from aco import BasicAnt, PheromoneTrail, Stagnation, Swarm, TimeLimit, UPDATES
+import analysis
+from osm import nearest_intersection
+
+
+RouteRequest = namedtuple('RouteRequest', ['start', 'max_distance', 'alpha', 'beta', 'evaporation', 'seed',
+                                           'size', 'rest', 'generations', 'patience', 'time', 'update'])
+RouteRequest.__new__.__defaults__ = (300, 1, 1, 0.75, None, 50, 100, 20, None, None, 'all')
+RouteRequest.__doc__ = """ One route search
+
+    start           the id of the node to start from, or a (lat, lon) pair
+                    to start from the closest intersection
+    max_distance    maximum distance each ant can travel
+    alpha, beta     parameters of the ACO local fitness function
+    evaporation     how fast the deposited pheromones decay
+    seed            seed for the search, random if None
+    size            number of ants in each generation
+    rest            how far an ant can go without resting
+    generations     maximum number of generations
+    patience        stop once the best route has not improved for this many generations
+    time            stop once the search has run for this many seconds
+    update          name of the pheromone update strategy from aco.UPDATES
+"""
+
+RouteResult = namedtuple('RouteResult', ['request', 'route', 'score', 'distance', 'interest',
+                                         'generations', 'seconds', 'time_to_best', 'stopped_by', 'seed',
+                                         'deterministic'])
+RouteResult.__new__.__defaults__ = (True,)
+RouteResult.__doc__ = """ The best route found for a RouteRequest
+
+    route           the ids of the nodes along the route
+    score           the score of the route as given by evaluate_route
+    distance        length of the route
+    interest        interest along the route
+    generations     how many generations were run
+    seconds         how long the search took
+    time_to_best    how long the search took to find the route
+    stopped_by      why the search ended early, None if it ran every generation
+    seed            the seed used, to repeat the search
+    deterministic   if repeating the search with the seed gives the same
+                    result, False if it was cut short by a time limit or
+                    interrupted
+"""
+
+
+def prepare(graph):
+    """ Set up a graph with a pheromone trail that searches can share """
+    trail = PheromoneTrail()
+    return graph.transform(t_edge=trail.wrap), trail
+
+
+def search(graph, trail, request, Ant=BasicAnt):
+    """ Run a single request over a prepared graph, resetting its trail first """
+    started = time()
+    trail.reset()
+    start = request.start if request.start in graph else nearest_intersection(graph, *request.start)
+    swarm = Swarm(request.size, request.max_distance, request.rest, request.alpha, request.beta,
+                  request.evaporation, Ant, request.seed, UPDATES[request.update]())
+    rules = []
+    if request.patience:
+        rules.append(Stagnation(request.patience))
+    if request.time:
+        rules.append(TimeLimit(request.time))
+    spot_best = analysis.PreserveBest(graph, 1, 1)
+    swarm(graph, [start], request.generations, spot_best, stop=rules)
+    if spot_best.best:
+        best = spot_best.best[-1]
+        route, score, distance, interest = list(best.moves), best.evaluate_route(), best.age, best.interest
+    else:
+        route, score, distance, interest = [start], 0, 0, 0
+    return RouteResult(request, route, score, distance, interest,
+                       swarm.generation, time()-started, swarm.found_after, swarm.stopped_by, swarm.seed,
+                       swarm.deterministic)
+
+
+class BatchSearch:
+    """ Answer batches of RouteRequests concurrently over one graph
+
+        graph       the loaded graph to search
+        workers     number of worker processes (default one per core)
+        cache       a cache.ResultCache of the graph, to only search requests
+                    it does not already have the results of
+    """
+    def __init__(self, graph, workers=None, Ant=BasicAnt, cache=None):
+        self.pool = worker_pool(graph, workers, Ant)
+        self.cache = cache
+
+    def __call__(self, requests):
+        """ Search every request, returning a RouteResult for each in the same order """
+        if self.cache is None:
+            return self.pool.map(search_in_worker, requests)
+        results = [self.cache.get(request) for request in requests]
+        missing = [request for request, result in zip(requests, results) if result is None]
+        found = iter(self.pool.map(search_in_worker, missing))
+        for i, result in enumerate(results):
+            if result is None:
+                results[i] = next(found)
+                self.cache.put(results[i])
+        return results
+
+    def close(self):
+        """ Shut down the worker pool """
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+
+def worker_pool(graph, workers=None, Ant=BasicAnt):
+    """ A process pool whose workers each hold graph prepared for searching
+        with search_in_worker
+
+        workers     number of worker processes (default one per core)
+    """
+    return Pool(workers, _init_worker, (graph, Ant))
+
+
+def search_in_worker(request):
+    """ Search request in a worker of a worker_pool, returning its RouteResult """
+    return search(_worker['graph'], _worker['trail'], request, _worker['Ant'])
+
+
+_worker = {}
+
+
+def _init_worker(graph, Ant):
+    _worker['graph'], _worker['trail'] = prepare(graph)
+    _worker['Ant'] = Ant
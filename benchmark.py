@@ -0,0 +1,305 @@
+#! /usr/bin/python3
+"""
+    Usage: benchmark.py [options] [<graphfile>]
+
+    <graphfile>                         OSM extract (.osm or .osm.bz2) or pickled graph to search,
+                                        the bundled Isle of Wight extract if not given
+
+    -r <repeat>, --repeat <repeat>      How many times to repeat each timing [default: 5]
+    --seed <seed>                       Seed for building synthetic data and searches [default: 1]
+    --sizes <widths>                    Widths of the synthetic grids, the random graphs have as many
+                                        nodes as each grid [default: 10,20,40]
+
+    --target <score>                    Route score the pheromone updates race to [default: 40]
+    -g <gen>, --generations <gen>       Most generations to give each update [default: 40]
+    --runs <runs>                       Seeded searches per update [default: 3]
+
+    --results <file>                    Save every timing to this JSON file
+    --compare <file>                    Show how the timings compare to those saved in this file
+"""
+from contextlib import redirect_stdout
+import io
+import json
+from math import hypot, pi, sqrt
+import platform
+from random import Random
+import subprocess
+from time import perf_counter, time
+from timeit import repeat
+import tracemalloc
+
+from aco import BasicAnt, Swarm, UPDATES
+from graph import Graph
+import osm
+
+
+class Place:
+    """ A node of a synthetic graph """
+    def __init__(self, position, interest=0, rest=False):
+        self.position = position
+        self.interest = interest
+        self.rest = rest
+
+
+class Road:
+    """ An edge of a synthetic graph """
+    def __init__(self, cost_out, interest=0, rest=False):
+        self.cost_out = cost_out
+        self.interest = interest
+        self.rest = rest
+        self.nid = []
+
+
+def grid_walk(steps, width, rng):
+    """ A random walk over a width x width grid that never steps straight back """
+    position, last = (0, 0), None
+    walk = [position]
+    for _ in range(steps):
+        x, y = position
+        options = [(nx, ny) for nx, ny in ((x+1, y), (x-1, y), (x, y+1), (x, y-1))
+                   if 0 <= nx < width and 0 <= ny < width and (nx, ny) != last]
+        last, position = position, rng.choice(options)
+        walk.append(position)
+    return walk
+
+
+def place(rng, position):
+    """ A place that is interesting one time in five and somewhere to rest one time in fifty """
+    return Place(position, 1 if rng.random() < 0.2 else 0, rng.random() < 0.02)
+
+
+def grid_graph(width, rng):
+    """ A width x width grid of two way roads, 1km apart """
+    g = Graph()
+    for x in range(width):
+        for y in range(width):
+            g.set_node(x*width+y+1, place(rng, (x, y)))
+    for x in range(width):
+        for y in range(width):
+            for nx, ny in ((x+1, y), (x, y+1)):
+                if nx < width and ny < width:
+                    interest = 1 if rng.random() < 0.1 else 0
+                    g.add_edge(x*width+y+1, nx*width+ny+1, Road(1, interest))
+                    g.add_edge(nx*width+ny+1, x*width+y+1, Road(1, interest))
+    return g
+
+
+def geometric_graph(count, rng, degree=4, size=20):
+    """ count places scattered over a size x size km square, with two way roads
+        between those close enough to give each about degree roads
+    """
+    radius = size*sqrt(degree/(pi*count))
+    points = [(rng.uniform(0, size), rng.uniform(0, size)) for _ in range(count)]
+    g = Graph()
+    cells = {}
+    for nid, (x, y) in enumerate(points, 1):
+        g.set_node(nid, place(rng, (x, y)))
+        cells.setdefault((int(x//radius), int(y//radius)), []).append(nid)
+    for nid, (x, y) in enumerate(points, 1):
+        cx, cy = int(x//radius), int(y//radius)
+        for other in (o for dx in (-1, 0, 1) for dy in (-1, 0, 1) for o in cells.get((cx+dx, cy+dy), ())):
+            if other > nid:
+                distance = hypot(x-points[other-1][0], y-points[other-1][1])
+                if distance <= radius:
+                    g.add_edge(nid, other, Road(distance))
+                    g.add_edge(other, nid, Road(distance))
+    return g
+
+
+def measure(make, run, repeats):
+    """ Time run(make()) repeats times, plus once more tracing memory
+
+        make        builds what is run on, outside of the timing
+        run         the work to time, any output is dropped
+
+        returns (seconds for the fastest run, peak bytes allocated by a run)
+    """
+    times = []
+    with redirect_stdout(io.StringIO()):
+        for _ in range(repeats):
+            subject = make()
+            started = perf_counter()
+            run(subject)
+            times.append(perf_counter()-started)
+        subject = make()
+        tracemalloc.start()
+        try:
+            run(subject)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return min(times), peak
+
+
+def result(benchmark, graph, size, seconds, peak, work=None, unit=None):
+    """ One row of results, work is how many units were done in seconds """
+    return {'benchmark': benchmark, 'graph': graph, 'size': size, 'seconds': seconds, 'peak': peak,
+            'throughput': work/seconds if work and seconds else None, 'unit': unit}
+
+
+def bench_loading(filename):
+    """ Time each phase of loading an OSM extract, once as it is slow
+
+        returns (a result for each phase and the whole load, the graph)
+    """
+    tracemalloc.start()
+    try:
+        with redirect_stdout(io.StringIO()):
+            started = time()
+            handler = osm.parse_osm(filename, 0.002)
+            seconds = time()-started
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    results = [result('load '+phase, filename, len(handler.graph), taken, None) for phase, taken in handler.timings.items()]
+    results.append(result('load', filename, len(handler.graph), seconds, peak, len(handler.graph), 'nodes'))
+    return results, handler.graph
+
+
+def bench_simplify(repeats, seed):
+    """ Time loop erasure of long wandering walks
+
+        yields a result for each length of walk
+    """
+    ant = BasicAnt(None, 0, 0, 1, 1)
+    for steps in (1000, 10000, 100000):
+        walk = grid_walk(steps, 50, Random(seed))
+        seconds = min(repeat(lambda: ant.simplify_journy(walk), number=1, repeat=repeats))
+        yield result('erase loops', 'walk', steps, seconds, None, steps, 'steps')
+
+
+def synthetic_graphs(widths, seed):
+    """ yields (name, size, make) for the synthetic graphs, make builds a fresh copy """
+    for width in widths:
+        yield 'grid', width*width, lambda width=width: grid_graph(width, Random(seed))
+        yield 'geometric', width*width, lambda width=width: geometric_graph(width*width, Random(seed))
+
+
+def bench_graphs(graphs, repeats, seed, clean=True):
+    """ Time cleaning and searching each graph
+
+        graphs  (name, size, make) for each graph, make builds a fresh copy
+        clean   if the graphs need simplifying, which is also timed
+
+        yields a result for each benchmark of each graph
+    """
+    for name, size, make in graphs:
+        cleaned = make()
+        if clean:
+            seconds, peak = measure(make, lambda g: g.simplify(), repeats)
+            yield result('simplify', name, size, seconds, peak, size, 'nodes')
+            with redirect_stdout(io.StringIO()):
+                cleaned.simplify()
+        if not len(cleaned):
+            continue
+        seconds, peak = measure(lambda: cleaned, lambda g: g.connected_components(), repeats)
+        yield result('connected components', name, size, seconds, peak, size, 'nodes')
+        starting_points = cleaned.find_most_connected_nodes()
+
+        def setup():
+            swarm = Swarm(50, 300, 100, 1, 1, 0.75, BasicAnt, seed)
+            return swarm, swarm.setup_graph(cleaned)
+
+        def generation(subject):
+            swarm, graph = subject
+            for ant in swarm.run_generation(graph, starting_points):
+                pass
+        seconds, peak = measure(setup, generation, repeats)
+        yield result('generation', name, size, seconds, peak, 50, 'ants')
+
+        def search(subject):
+            swarm, graph = subject
+            swarm(graph, starting_points, 10)
+        seconds, peak = measure(setup, search, max(1, repeats//2))
+        yield result('search', name, size, seconds, peak, 500, 'ants')
+
+
+class ReachedTarget:
+    """ Stop a search once its best route scores at least target """
+    def __init__(self, target):
+        self.target = target
+
+    def __call__(self, swarm, gen, ants):
+        return swarm.best is not None and swarm.best.evaluate_route() >= self.target
+
+    def __str__(self):
+        return "reached {}".format(self.target)
+
+
+def bench_updates(graph, target, generations, runs, seed):
+    """ Race each pheromone update strategy to a target route score
+
+        yields (update, runs reaching the target, mean generations taken,
+                mean best score, mean seconds), counting generations as
+                all of them for runs that miss the target
+    """
+    starting_points = graph.find_most_connected_nodes()
+    for name, Update in sorted(UPDATES.items()):
+        reached, taken, scores, seconds = 0, 0, 0, 0
+        for run in range(runs):
+            swarm = Swarm(50, 300, 100, 1, 1, 0.75, BasicAnt, seed+run, Update())
+            started = time()
+            swarm(graph, starting_points, generations, stop=[ReachedTarget(target)])
+            seconds += time()-started
+            reached += 1 if swarm.stopped_by else 0
+            taken += swarm.generation
+            scores += swarm.best.evaluate_route()
+        yield name, reached, taken/runs, scores/runs, seconds/runs
+
+
+def environment():
+    """ What the benchmarks ran on, to tell results files apart """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {'commit': commit or None, 'python': platform.python_version(), 'machine': platform.machine(), 'time': time()}
+
+
+def display_result(row, old=None):
+    """ Print a result, and how much faster it is than old if given """
+    line = "{:<22} {:<10} {:>7} {:10.6f}s".format(row['benchmark'], row['graph'][-10:], row['size'], row['seconds'])
+    if row['throughput']:
+        line += " {:12,.0f} {}/s".format(row['throughput'], row['unit'])
+    if row['peak']:
+        line += " {:8,d}kb peak".format(row['peak']//1024)
+    if old:
+        line += " {:5.2f}x".format(old['seconds']/row['seconds'] if row['seconds'] else 0)
+    print(line)
+
+
+if __name__ == '__main__':
+    from docopt import docopt
+    arguments = docopt(__doc__)
+    repeats, seed = int(arguments['--repeat']), int(arguments['--seed'])
+    widths = [int(w) for w in arguments['--sizes'].split(',')]
+    filename = arguments['<graphfile>'] or 'isle-of-wight-latest.osm.bz2'
+    old = {}
+    if arguments['--compare']:
+        with open(arguments['--compare']) as source:
+            old = {(r['benchmark'], r['graph'], r['size']): r for r in json.load(source)['results']}
+    results = []
+    print("Benchmark              Graph         Size    Fastest")
+    for row in bench_simplify(repeats, seed):
+        display_result(row, old.get((row['benchmark'], row['graph'], row['size'])))
+        results.append(row)
+    if filename.endswith(('.osm', '.bz2')):
+        loading, graph = bench_loading(filename)
+        for row in loading:
+            display_result(row, old.get((row['benchmark'], row['graph'], row['size'])))
+            results.append(row)
+    else:
+        graph = osm.load_graph_file(filename, 0.002)
+    for row in bench_graphs([(filename, len(graph), lambda: graph)], repeats, seed, clean=False):
+        display_result(row, old.get((row['benchmark'], row['graph'], row['size'])))
+        results.append(row)
+    for row in bench_graphs(synthetic_graphs(widths, seed), repeats, seed):
+        display_result(row, old.get((row['benchmark'], row['graph'], row['size'])))
+        results.append(row)
+    if arguments['--results']:
+        with open(arguments['--results'], 'w') as sink:
+            json.dump({'environment': environment(), 'results': results}, sink, indent=1)
+    target, generations, runs = float(arguments['--target']), int(arguments['--generations']), int(arguments['--runs'])
+    print("Generations to a score of", target)
+    for name, reached, taken, score, seconds in bench_updates(graph, target, generations, runs, seed):
+        print("{:>8} reached {}/{} in {:5.1f} generations, best {:7.2f} {:7.2f}s".format(name, reached, runs, taken, score, seconds))
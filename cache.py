@@ -0,0 +1,178 @@
+""" Remember the results of route searches
+
+    Results are kept by a key made from what the graph holds and the
+    normalised fields of the request, so the same request over the same
+    graph is only searched once, while any change to the graph makes every
+    earlier result miss. Only seeded requests are kept, as an unseeded
+    search is expected to find a different route every time, and only
+    results a repeat of the search would find again, so not those cut short
+    by a time limit or an interruption.
+"""
+from collections import OrderedDict
+from hashlib import sha1
+import os
+import pickle
+import threading
+
+from osm import nearest_intersection
+
+
+def fingerprint(graph):
+    """ A hash of the nodes and edges of a graph and what a search sees of them """
+    signature = sha1()
+    for nid in graph:
+        node = graph[nid]
+        signature.update(repr((nid, getattr(node, 'interest', 0), getattr(node, 'rest', False))).encode())
+    for f, t, edge in graph.get_edges():
+        signature.update(repr((f, t, edge.cost_out, getattr(edge, 'interest', 0), getattr(edge, 'rest', False))).encode())
+    return signature.hexdigest()
+
+
+# the fields of a RouteRequest that are real numbers, so 300 and 300.0 search alike
+REAL_FIELDS = ('max_distance', 'alpha', 'beta', 'evaporation', 'time')
+
+
+def normalise(graph, request):
+    """ The fields of a RouteRequest that change its result, real numbers as
+        floats and starting points as the intersection the search would
+        start from
+
+        Other fields are kept as they are, as a seed of 1 and 1.0 give
+        different searches
+    """
+    start = request.start if request.start in graph else nearest_intersection(graph, *request.start)
+    fields = request._replace(start=start)._asdict()
+    for name in REAL_FIELDS:
+        value = fields[name]
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            fields[name] = float(value)
+    return tuple(fields.values())
+
+
+class ResultCache:
+    """ The most recently used RouteResults of searches over a graph
+
+        graph       the graph searched
+        capacity    how many results to hold in memory
+        folder      where to also save results, so they outlive the process
+        disk_limit  most bytes of results to keep in folder, the least
+                    recently used are removed first
+    """
+    def __init__(self, graph, capacity=1000, folder=None, disk_limit=100*2**20):
+        self.capacity = capacity
+        self.folder = folder
+        self.disk_limit = disk_limit
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits, self.misses = 0, 0
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.rebuilt(graph)
+
+    def rebuilt(self, graph):
+        """ Forget every result of an earlier version of the graph """
+        with self.lock:
+            self.graph = graph
+            self.version = fingerprint(graph)
+            self.results.clear()
+            for name in self.saved():
+                if not name.startswith(self.version):
+                    os.remove(os.path.join(self.folder, name))
+
+    def key(self, request):
+        """ The key of a request, None if its results are not kept """
+        if request.seed is None:
+            return None
+        return self.version + '-' + sha1(repr(normalise(self.graph, request)).encode()).hexdigest()
+
+    def saved(self):
+        """ The names of the files of the results in folder """
+        if not self.folder:
+            return []
+        return [name for name in os.listdir(self.folder) if name.endswith('.result')]
+
+    def get(self, request):
+        """ The result of an earlier search for request, None if there was none """
+        key = self.key(request)
+        if key is None:
+            return None
+        with self.lock:
+            result = self.results.get(key)
+            if result is not None:
+                self.results.move_to_end(key)
+        if result is None and self.folder:
+            result = self.load(key)
+            if result is not None:
+                self.remember(key, result)
+        with self.lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return result._replace(request=request)
+
+    def put(self, result):
+        """ Keep the result of a search, unless repeating it could give another """
+        if not result.deterministic:
+            return
+        key = self.key(result.request)
+        if key is None:
+            return
+        self.remember(key, result)
+        if self.folder:
+            self.save(key, result)
+
+    def remember(self, key, result):
+        with self.lock:
+            self.results[key] = result
+            self.results.move_to_end(key)
+            while len(self.results) > self.capacity:
+                self.results.popitem(last=False)
+
+    def load(self, key):
+        filename = os.path.join(self.folder, key+'.result')
+        try:
+            with open(filename, 'rb') as source:
+                result = pickle.load(source)
+            os.utime(filename)
+            return result
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def save(self, key, result):
+        filename = os.path.join(self.folder, key+'.result')
+        with open(filename+'.tmp', 'wb') as sink:
+            pickle.dump(result, sink)
+        os.replace(filename+'.tmp', filename)
+        self.trim()
+
+    def trim(self):
+        """ Remove the least recently used results in folder until they fit in disk_limit """
+        files = []
+        for entry in os.scandir(self.folder):
+            if entry.name.endswith('.result'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_limit:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def __call__(self, request, search):
+        """ The result of request, from search(request) if it is not already known """
+        result = self.get(request)
+        if result is None:
+            result = search(request)
+            self.put(result)
+        return result
+
+    def __str__(self):
+        return "Cache {} results, {} hits, {} misses".format(len(self.results), self.hits, self.misses)
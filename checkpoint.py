@@ -0,0 +1,93 @@
+""" Save and restore the state of a swarm part way through a search
+
+    A checkpoint holds the pheromone trail, generation counter, seed, best
+    route and the state of the update strategy and any kept analysers. As
+    the ants of each generation draw from streams seeded by (seed,
+    generation, ant) a resumed search carries on exactly as it would have.
+"""
+from array import array
+from hashlib import sha1
+import os
+import pickle
+
+from analysis import StubAnaliser
+
+
+def layout(graph):
+    """ A signature of the order of the edges in a graph, which the pheromone trail follows """
+    signature = sha1()
+    for f, t, _ in graph.get_edges():
+        signature.update(repr((f, t)).encode())
+    return signature.hexdigest()
+
+
+class Checkpoint:
+    """ The saved state of a swarm """
+    def __init__(self, state):
+        self.state = state
+
+    @classmethod
+    def take(cls, swarm, graph, *keep):
+        """ Capture the state of a swarm searching graph, along with the state of the keep analysers """
+        return cls({
+            'layout': layout(graph),
+            'levels': swarm.trail.levels.tobytes(),
+            'generation': swarm.generation,
+            'seed': swarm.seed,
+            'best': swarm.best,
+            'improved': swarm.improved,
+            'found_after': swarm.found_after,
+            'update': vars(swarm.update),
+            'keep': [vars(k) for k in keep],
+        })
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'rb') as source:
+            return cls(pickle.load(source))
+
+    def save(self, filename):
+        """ Write the checkpoint, replacing any old one only once it is complete """
+        with open(filename+'.tmp', 'wb') as sink:
+            pickle.dump(self.state, sink, pickle.HIGHEST_PROTOCOL)
+        os.replace(filename+'.tmp', filename)
+
+    def warm_start(self, swarm, graph):
+        """ Start a new search from the pheromone trail of this checkpoint """
+        if layout(graph) != self.state['layout']:
+            raise ValueError("Checkpoint was taken on a different graph")
+        levels = array('d')
+        levels.frombytes(self.state['levels'])
+        swarm.trail.levels = levels
+
+    def restore(self, swarm, graph, *keep):
+        """ Carry on the search this checkpoint was taken from, restoring the keep analysers """
+        self.warm_start(swarm, graph)
+        swarm.seed = self.state['seed']
+        swarm.generation = self.state['generation']
+        swarm.best = self.state['best']
+        swarm.improved = self.state['improved']
+        swarm.found_after = self.state['found_after']
+        vars(swarm.update).update(self.state['update'])
+        for k, state in zip(keep, self.state['keep']):
+            vars(k).update(state)
+
+
+class Checkpointer(StubAnaliser):
+    """ Save a checkpoint of a swarm every few generations
+
+        swarm       the swarm to checkpoint
+        filename    where to save the checkpoints
+        every       how many generations between checkpoints
+        keep        analysers whose state is saved with the swarm
+    """
+    def __init__(self, swarm, filename, every=5, *keep):
+        self.swarm = swarm
+        self.filename = filename
+        self.every = every
+        self.keep = keep
+
+    def __call__(self, graph, gen, ants):
+        if not (gen+1) % self.every:
+            Checkpoint.take(self.swarm, graph, *self.keep).save(self.filename)
+        return []
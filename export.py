@@ -0,0 +1,95 @@
+""" Write routes and pheromone trails out as GPX or GeoJSON
+
+    Routes are drawn along the full shape of every road they take, using
+    the positions of the OSM nodes along each edge kept in the graph's
+    coordinates, and are written straight to the file as they are expanded
+    rather than built up in memory first.
+"""
+from datetime import datetime, timezone
+import json
+from xml.sax.saxutils import escape
+
+
+def edge_between(graph, a, b, eid=None):
+    """ The edge from a to b, the one with this pheromone trail id if there are several """
+    edges = graph.get_edges(a, b)
+    if eid is not None:
+        for edge in edges:
+            if getattr(edge, 'eid', None) == eid:
+                return edge
+    return edges[0]
+
+
+def route_points(graph, moves, edges=None):
+    """ Every (lat, lon) along a route, including the points along each edge
+
+        moves   the ids of the nodes along the route
+        edges   the ids in the pheromone trail of the edges taken, to pick
+                between roads joining the same nodes
+
+        Points along an edge whose positions are not known are left out
+    """
+    coordinates = graph.coordinates
+    for i, nid in enumerate(moves):
+        if i:
+            edge = edge_between(graph, moves[i-1], nid, edges[i-1] if edges else None)
+            if coordinates is not None:
+                for point in getattr(edge, 'nid', ()):
+                    if point in coordinates:
+                        yield coordinates[point]
+        yield graph[nid].position
+
+
+def write_gpx(sink, tracks):
+    """ Stream tracks into a GPX file
+
+        sink    an open text file
+        tracks  (name, points) for each track, points being (lat, lon)
+    """
+    sink.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+               '<gpx version="1.1" creator="Cycling Ants" xmlns="http://www.topografix.com/GPX/1/1">\n'
+               '<metadata><time>{}</time></metadata>\n'.format(datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')))
+    for name, points in tracks:
+        sink.write('<trk><name>{}</name><trkseg>\n'.format(escape(str(name))))
+        sink.writelines('<trkpt lat="{:.7f}" lon="{:.7f}"/>\n'.format(lat, lon) for lat, lon in points)
+        sink.write('</trkseg></trk>\n')
+    sink.write('</gpx>\n')
+
+
+def write_geojson(sink, features):
+    """ Stream lines into a GeoJSON FeatureCollection
+
+        sink        an open text file
+        features    (properties, points) for each line, points being (lat, lon)
+    """
+    sink.write('{"type": "FeatureCollection", "features": [\n')
+    for i, (properties, points) in enumerate(features):
+        sink.write('{}{{"type": "Feature", "properties": {}, "geometry": {{"type": "LineString", "coordinates": ['.format(
+            ',\n' if i else '', json.dumps(properties)))
+        sink.write(','.join('[{:.7f},{:.7f}]'.format(lon, lat) for lat, lon in points))
+        sink.write(']}}')
+    sink.write('\n]}\n')
+
+
+def export_routes(filename, graph, routes):
+    """ Save routes to a GPX file, or GeoJSON if filename ends .geojson or .json
+
+        routes  anything with moves, and optionally edges, score, age and
+                interest, such as analysis.Route or an ant
+    """
+    with open(filename, 'w') as sink:
+        if filename.endswith(('.geojson', '.json')):
+            write_geojson(sink, (({'score': route.evaluate_route(), 'distance': route.age, 'interest': route.interest},
+                                  route_points(graph, route.moves, getattr(route, 'edges', None))) for route in routes))
+        else:
+            write_gpx(sink, (("Route {} score {:.2f}".format(i+1, route.evaluate_route()),
+                              route_points(graph, route.moves, getattr(route, 'edges', None))) for i, route in enumerate(routes)))
+
+
+def export_pheromones(filename, graph):
+    """ Save every edge of a searched graph as GeoJSON, with its pheromone level """
+    def features():
+        for a, b, edge in graph.get_edges():
+            yield {'pheromones': edge.pheromones}, route_points(graph, [a, b], [getattr(edge, 'eid', None)])
+    with open(filename, 'w') as sink:
+        write_geojson(sink, features())
@@ -6,6 +6,9 @@ def bag():
 
 
 class Graph:
+    # positions of any points along the edges that are not nodes, see osm.CoordinateStore
+    coordinates = None
+
     def __init__(self):
         self.node_info = {}
         self.node_links = defaultdict(bag)
@@ -33,6 +36,9 @@ class Graph:
     def __iter__(self):
         return iter(self.node_info)
 
+    def __contains__(self, nodeid):
+        return nodeid in self.node_info
+
     def __getitem__(self, nodeid):
         return self.node_info[nodeid]
 
@@ -49,7 +55,7 @@ class Graph:
         if tid and fid:
             return self.node_links[fid][tid]
         elif tid:
-            return [(nid, e) for nid, es in self.node_links.items() for e in es[tid]]
+            return [(nid, e) for nid, es in self.node_links.items() for e in es.get(tid, ())]
         elif fid:
             return [(nid, e) for nid, es in self.node_links[fid].items() for e in es]
         else:
@@ -137,6 +143,7 @@ class Graph:
             res.set_node(t_id(n), t_node(self.get_node(n)))
         for n, nid, e in self.get_edges():
             res.add_edge(t_id(n), t_id(nid), t_edge(e))
+        res.coordinates = self.coordinates
         return res
 
     def connected_components(self):
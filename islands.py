@@ -0,0 +1,142 @@
+""" Several colonies searching the same graph side by side
+
+    Each colony is a Swarm with its own pheromone trail, run for a few
+    generations at a time (an epoch) by a pool of worker processes. Between
+    epochs the colonies share what they have found: either the best route
+    of all the colonies is laid on every trail, or every trail is blended
+    towards the mean of them all.
+"""
+from array import array
+from copy import deepcopy
+from multiprocessing import Pool
+from random import Random
+from time import time
+
+from aco import PheromoneTrail, analyse, lay
+from analysis import PreserveBest
+from batch import prepare
+
+
+MIGRATIONS = ('best', 'blend')
+
+
+class Islands:
+    """ Run copies of a swarm as separate colonies, trading routes every few generations """
+    def __init__(self, swarm, colonies, every=5, migration='best', blend=0.25, workers=None):
+        """ swarm       a Swarm whose settings every colony copies, each
+                        colony gets its own seed drawn from swarm.seed
+            colonies    how many colonies to run
+            every       generations between migrations
+            migration   'best' to lay the best route of all colonies on every
+                        trail, or 'blend' to move every trail towards the mean
+            blend       how far to move towards the mean when blending
+            workers     number of worker processes, one per colony if not given
+        """
+        if migration not in MIGRATIONS:
+            raise ValueError("Unknown migration {}".format(migration))
+        self.template = swarm
+        self.seed = swarm.seed
+        self.colonies = colonies
+        self.every = every
+        self.migration = migration
+        self.blend = blend
+        self.workers = workers if workers else colonies
+        self.trail = PheromoneTrail()
+        self.best = None
+
+    def seeds(self):
+        rng = Random(self.seed)
+        return [rng.randrange(2**32) for _ in range(self.colonies)]
+
+    def __call__(self, graph, starting_points, rounds, *analytics, stop=()):
+        """ Run a full search on this graph, as Swarm.__call__
+
+            Analysers are called every generation with the best ant of each
+            colony, and the graph holds the mean of the colonies' trails as
+            it was at the end of the last migration. Stopping rules see every
+            generation too, but a search can only stop at a migration.
+
+            returns the graph with the mean trail of all the colonies
+        """
+        self.started = time()
+        self.stopped_by = None
+        self.best, self.generation, self.found_after = None, 0, None
+        self.trail = PheromoneTrail()
+        states = [{'seed': seed} for seed in self.seeds()]
+        pool = Pool(self.workers, _init_worker, (graph, self.template))
+        graph = graph.transform(t_edge=self.trail.wrap)
+        try:
+            while self.generation < rounds:
+                until = min(rounds, self.generation+self.every)
+                jobs = [(state, starting_points, until) for state in states]
+                epoch = pool.map(_run_colony, jobs)
+                states = [state for state, _ in epoch]
+                self.migrate(states)
+                for g in range(self.generation, until):
+                    ants = [by_gen[g-self.generation][-1] for _, by_gen in epoch]
+                    analyse(analytics, graph, g, ants)
+                    for rule in stop:
+                        if rule(self, g, ants) and not self.stopped_by:
+                            self.stopped_by = str(rule)
+                self.generation = until
+                if self.stopped_by:
+                    break
+        except KeyboardInterrupt:
+            self.stopped_by = "interrupted"
+        finally:
+            pool.terminate()
+            pool.join()
+            for an in analytics:
+                if hasattr(an, 'close'):
+                    an.close()
+        return graph
+
+    def migrate(self, states):
+        """ Share the best route of all colonies, and update the mean trail """
+        trails = [state['levels'] for state in states]
+        for state in states:
+            if state['best'] is not None and (self.best is None or state['best'].evaluate_route() > self.best.evaluate_route()):
+                self.best = state['best']
+                self.found_after = time()-self.started
+        mean = array('d', (sum(levels)/len(trails) for levels in zip(*trails)))
+        if self.migration == 'best' and self.best is not None:
+            for levels in trails:
+                lay(levels, self.best, self.best.evaluate_route())
+        elif self.migration == 'blend':
+            for levels in trails:
+                for eid, level in enumerate(mean):
+                    levels[eid] += self.blend*(level-levels[eid])
+        self.trail.levels = mean
+
+
+_worker = {}
+
+
+def _init_worker(graph, template):
+    _worker['graph'], _worker['trail'] = prepare(graph)
+    _worker['template'] = template
+
+
+def _run_colony(job):
+    """ Run one colony up to generation until, returning its new state and the best ant of each generation """
+    state, starting_points, until = job
+    swarm = deepcopy(_worker['template'])
+    swarm.seed = state['seed']
+
+    def resume(swarm, graph):
+        if 'levels' in state:
+            swarm.trail.levels = state['levels']
+            swarm.generation = state['generation']
+            swarm.best, swarm.improved = state['best'], state['improved']
+            vars(swarm.update).update(state['update'])
+    _worker['trail'].reset()
+    spot_best = PreserveBest(None, 1, 1, history=None)
+    swarm(_worker['graph'], starting_points, until, spot_best, resume=resume)
+    return {
+        'seed': swarm.seed,
+        'levels': swarm.trail.levels,
+        'generation': swarm.generation,
+        'best': swarm.best,
+        'improved': swarm.improved,
+        'update': vars(swarm.update),
+    }, spot_best.best_by_gen
@@ -5,27 +5,64 @@
         main.py makepickle <osmfile> <picklefile>
         main.py -h | --help | --version
 
+    <osmfile> can be several OSM extracts separated by commas, which are
+    loaded side by side and stitched into one graph.
+
     -m <dist>, --max <dist>             Max distance [default: 300]
-    -g <gen>, --generations <ge>        Number of Generations [default: 20]
+    -g <gen>, --generations <ge>        Maximum number of Generations [default: 20]
     -s <size>, --size <size>            Swarm size [default: 50]
     -r <rest>, --rest <rest>            Rest period [default: 100]
 
     -a <alpha>, --alpha <alpha>         Alpha value for ACO [default: 1]
     -b <beta>, --beta <beta>            Beta value for ACD [default: 1]
     -e <evap>, --evaporation <evap>     Evaporation [default: 0.75]
+    -u <mode>, --update <mode>          How ants lay pheromones, one of all, best, elitist, rank or maxmin [default: all]
+    --elite <weight>                    Weight of the best route for elitist, or ranks for rank updates [default: 6]
+
+    -w <workers>, --workers <workers>   Worker processes to run ants on, ignored with --islands [default: 1]
+    --vector                            Move all the ants of a generation together, needs NumPy
+    --seed <seed>                       Seed for the random choices of the ants
+
+    --islands <n>                       Run this many colonies side by side, trading routes as they go
+    --migrate <gen>                     Generations between trades of the colonies [default: 5]
+    --migration <mode>                  What colonies trade, best for the best route or blend for their trails [default: best]
 
+    --patience <gen>                    Stop once the best route has not improved for this many generations
+    --entropy <level>                   Stop once the pheromone entropy (0 to 1) falls below this level
+    --time <seconds>                    Stop once the search has run for this long
+
+    --checkpoint <file>                 Save the state of the search to this file every few generations
+    --every <gen>                       Generations between checkpoints [default: 5]
+    --resume <file>                     Carry on the search saved in this checkpoint
+    --warm <file>                       Start from the pheromone trail saved in this checkpoint
+
+    --tags <rules>                      JSON file of the rules for what OSM tags mean, see tagrules.py
     --halo <range>                      How far to project interesting points on to routes [default: 0.002]
 
-    --analysisfile <file>               Where to store a CSV summary of what happened
+    --heatmap <file>                    Save every road with its pheromone level to this GeoJSON file
+    --analysisfile <file>               Where to store a CSV summary of what happened, or a .npz file of columns
+    --instrument                        Analyse how fast the search runs
+    --memory                            Report where the memory of the search went
+    --profile <folder>                  Profile each phase of the search, saving the profiles to this folder
+    --top <n>                           How many of the slowest functions of each phase to show when profiling [default: 10]
+    --analysis <cost>                   Run analysers costing up to this, free, ants or graph [default: graph]
+    --analysis-every <gen>              Run analysers that cost anything every this many generations, and on the last,
+                                        or only on the first and last if ends [default: 1]
+    --sample <fraction>                 Fraction of the ants and edges analysers look at, more than 0 [default: 1]
 """
 
 __version__ = "0.1"
 
 import pickle
 
-from aco import BasicAnt, Swarm
+from aco import BasicAnt, Converged, Elitist, ParallelSwarm, RankBased, Stagnation, Swarm, TimeLimit, UPDATES
 import analysis
-from display import GPXOutput
+from checkpoint import Checkpoint, Checkpointer
+from export import export_pheromones, export_routes
+from islands import Islands
+from profiling import PhaseProfiler, profile_loading, profile_swarm
+from sizing import format_report, memory_report
+from tagrules import TagRules
 import osm
 
 
@@ -50,8 +87,8 @@ def most_marked_route(graph, start, max_distance):
         distance += edge[1].cost_out
 
 
-def set_up_analyisis(graph, config):
-    """ Create analysers and if set in config wrap in a CSVWrapper"""
+def set_up_analyisis(graph, config, swarm=None):
+    """ Create analysers within the cost and schedule set in config and if set wrap in a CSVWrapper"""
     classes = [analysis.GraphOverview,
             analysis.Printer,
             analysis.TrackNodeVisits,
@@ -59,7 +96,21 @@ def set_up_analyisis(graph, config):
             analysis.TrackInterest,
             analysis.StepsTaken,
             analysis.Distance]
-    analysers = [an for an in (a(graph) for a in classes) if an is not None]
+    budget = analysis.COSTS.index(config['--analysis'])
+    every, sample = analysis_every(config), float(config['--sample'])
+    last = int(config['--generations'])-1
+    analysers = []
+    for a in classes:
+        if analysis.COSTS.index(a.cost) > budget:
+            continue
+        an = a(graph, sample) if a is analysis.PheromoneConcentration else a(graph)
+        if an is None:
+            continue
+        if an.cost != 'free' and (every != 1 or sample < 1):
+            an = analysis.Scheduled(an, every, last, sample)
+        analysers.append(an)
+    if swarm is not None and config['--instrument']:
+        analysers.append(analysis.Instrumentation(swarm))
     if analysers and config['--analysisfile']:
         return [analysis.CSVWrapper(config['--analysisfile'], analysers)]
     else:
@@ -78,11 +129,9 @@ def display_analysis(analysis):
                     print(e)
 
 
-def display(filename, route):
-    """ Draw the most marked trail as a gpx track """
-    sink = GPXOutput()
-    sink.add_track(route)
-    sink.save_to_file(filename)
+def display(filename, graph, route):
+    """ Draw the route along the roads it takes as a gpx track, or GeoJSON if filename ends .geojson """
+    export_routes(filename, graph, [route])
 
 
 def build_swarm_from_config(config):
@@ -93,58 +142,159 @@ def build_swarm_from_config(config):
     alpha = float(config['--alpha'])
     beta = float(config['--beta'])
     evaporation = float(config['--evaporation'])
-    return Swarm(size, max_distance, rest, alpha, beta, evaporation, BasicAnt)
+    seed = int(config['--seed']) if config['--seed'] else None
+    update = build_update_from_config(config)
+    workers = int(config['--workers'])
+    if config['--islands']:
+        swarm = Swarm(size, max_distance, rest, alpha, beta, evaporation, BasicAnt, seed, update)
+        return Islands(swarm, int(config['--islands']), int(config['--migrate']), config['--migration'])
+    if config['--vector']:
+        from vector import VectorSwarm
+        return VectorSwarm(size, max_distance, rest, alpha, beta, evaporation, BasicAnt, seed, update)
+    if workers > 1:
+        return ParallelSwarm(size, max_distance, rest, alpha, beta, evaporation, BasicAnt, seed, update, workers)
+    return Swarm(size, max_distance, rest, alpha, beta, evaporation, BasicAnt, seed, update)
+
+
+def build_update_from_config(config):
+    """ Choose how the ants lay pheromones using settings from the config"""
+    Update = UPDATES[config['--update']]
+    if Update in (Elitist, RankBased):
+        return Update(int(config['--elite']))
+    return Update()
+
+
+def build_rules_from_config(config):
+    """ The rules for reading OSM tags set in the config, None for the defaults"""
+    return TagRules.load(config['--tags']) if config['--tags'] else None
+
+
+def build_stopping_rules(config):
+    """ Create the rules for ending a search early that are set in the config"""
+    rules = []
+    if config['--patience']:
+        rules.append(Stagnation(int(config['--patience'])))
+    if config['--entropy']:
+        rules.append(Converged(float(config['--entropy'])))
+    if config['--time']:
+        rules.append(TimeLimit(float(config['--time'])))
+    return rules
+
 
+def build_resume_from_config(config, *keep):
+    """ How to pick up from an earlier search, if set in the config"""
+    if config['--resume']:
+        checkpoint = Checkpoint.load(config['--resume'])
+        return lambda swarm, graph: checkpoint.restore(swarm, graph, *keep)
+    if config['--warm']:
+        return Checkpoint.load(config['--warm']).warm_start
+    return None
 
-def graph_to_gpx(graph, config):
-    """ Run and analyse an ACO search using parameters provided by config """
+
+def analysis_every(config):
+    """ Generations between runs of the analysers that cost anything, None for only the first and last"""
+    return None if config['--analysis-every'] == 'ends' else int(config['--analysis-every'])
+
+
+def check_config(config):
+    """ Why the settings in config can not be used together, None if they can"""
+    if not 0 < float(config['--sample']) <= 1:
+        return "--sample must be more than 0 and at most 1"
+    if config['--analysis-every'] != 'ends' and int(config['--analysis-every']) < 1:
+        return "--analysis-every must be at least 1, or ends"
+    if config['--update'] == 'maxmin' and float(config['--evaporation']) >= 1:
+        return "--update maxmin needs an --evaporation below 1"
+    if config['--islands']:
+        for option in ('--checkpoint', '--resume', '--warm', '--instrument'):
+            if config[option]:
+                return "{} can not be used with islands".format(option)
+    return None
+
+
+def graph_to_gpx(graph, config, profiler=None):
+    """ Run and analyse an ACO search using parameters provided by config
+
+        profiler    a PhaseProfiler to profile the phases of the search with
+    """
+    problem = check_config(config)
+    if problem:
+        print(problem)
+        return
     max_distance = int(config['--max'])
     if config['geo']:
-        starting_points = [(float(config['<lat>']), float(config['<lon>']))]
+        starting_points = [osm.nearest_intersection(graph, float(config['<lat>']), float(config['<lon>']))]
     else:
         starting_points = graph.find_most_connected_nodes()
     print("start", starting_points)
-    evaluation = set_up_analyisis(graph, config)
     swarm = build_swarm_from_config(config)
+    evaluation = set_up_analyisis(graph, config, swarm)
+    print("seed", swarm.seed)
     generations = int(config['--generations'])
     spot_best = analysis.PreserveBest(graph)
-    try:
-        result = swarm(graph, starting_points, generations, spot_best, *evaluation)
-    except KeyboardInterrupt:
-        pass
+    if config['--checkpoint']:
+        evaluation.append(Checkpointer(swarm, config['--checkpoint'], int(config['--every']), spot_best))
+    resume = build_resume_from_config(config, spot_best)
+    analytics = [spot_best]+evaluation
+    if profiler:
+        analytics = profile_swarm(profiler, swarm, analytics)
+    if isinstance(swarm, Islands):
+        result = swarm(graph, starting_points, generations, *analytics, stop=build_stopping_rules(config))
     else:
-        display_analysis(evaluation)
-        if config['<gpxfile>']:
-            display(config['<gpxfile>'], spot_best.best[-1])
+        result = swarm(graph, starting_points, generations, *analytics,
+                       stop=build_stopping_rules(config), resume=resume)
+    if swarm.stopped_by:
+        print("Stopped early,", swarm.stopped_by)
+    display_analysis(evaluation)
+    if config['--memory'] and not isinstance(swarm, Islands):
+        print()
+        print(format_report(memory_report(result, swarm.trail, swarm.ants)))
+    if config['<gpxfile>'] and spot_best.best:
+        display(config['<gpxfile>'], result, spot_best.best[-1])
+    if config['--heatmap']:
+        export_pheromones(config['--heatmap'], result)
 
 
-def osmtogpx(config):
+def osmtogpx(config, profiler=None):
     """ Perform an ACO search on OSM data to generate a GPX track"""
-    osmgraph = osm.load_graph(config['<osmfile>'], float(config['--halo']))
-    graph_to_gpx(osmgraph, config)
+    if profiler:
+        handler = profile_loading(profiler, osm.OSMHandler(float(config['--halo']), build_rules_from_config(config)))
+        osmgraph = profiler.wrap('parse', osm.parse_extracts)(config['<osmfile>'].split(','), float(config['--halo']), handler).graph
+    else:
+        osmgraph = osm.load_graph(config['<osmfile>'], float(config['--halo']), rules=build_rules_from_config(config))
+    graph_to_gpx(osmgraph, config, profiler)
 
 
 def osmtopickle(config):
     """ Load an OSM file and save the results as a pickle for future use"""
-    osmgraph = osm.load_graph(config['<osmfile>'], float(config['--halo']))
+    osmgraph = osm.load_graph(config['<osmfile>'], float(config['--halo']), rules=build_rules_from_config(config))
     if config['<picklefile>']:
         with open(config['<picklefile>'], 'wb') as sink:
             pickle.dump(osmgraph, sink)
 
 
-def pickletogpx(config):
+def pickletogpx(config, profiler=None):
     """ Perform an ACO search over an existing graph to generate a gpx track"""
     with open(config['<picklefile>'], 'rb') as source:
-        osmgraph = pickle.load(source)
-    graph_to_gpx(osmgraph, config)
+        osmgraph = profiler.wrap('load', pickle.load)(source) if profiler else pickle.load(source)
+    graph_to_gpx(osmgraph, config, profiler)
 
 
 if __name__ == '__main__':
     from docopt import docopt
     config = docopt(__doc__, version="Cycling Ants "+__version__)
-    if config['osm']:
-        osmtogpx(config)
-    elif config['pickle']:
-        pickletogpx(config)
-    elif config['makepickle']:
-        osmtopickle(config)
+    profiler = PhaseProfiler() if config.get('--profile') else None
+    if profiler:
+        profiler.start()
+    try:
+        if config['osm']:
+            osmtogpx(config, profiler)
+        elif config['pickle']:
+            pickletogpx(config, profiler)
+        elif config['makepickle']:
+            osmtopickle(config)
+    finally:
+        if profiler:
+            profiler.stop()
+            profiler.save(config['--profile'])
+            print()
+            print(profiler.summary(int(config['--top'])))
@@ -4,25 +4,26 @@
 
     -h, --halo <halo>         How far to project interesting points on to routes [default: 0.002]
 """
+from array import array
+from bisect import bisect_left
+import bz2
+from collections import Counter
 from math import acos, sin, cos, radians
+from multiprocessing import Pool
+import pickle
+from sys import intern
 from time import time
 import sqlite3
 import xml.sax as sax
 from xml.sax.handler import ContentHandler
 
-from sizing import total_size
+from sizing import format_report, memory_report
 from graph import Graph
+from tagrules import DEFAULT as DEFAULT_RULES
 
 
-def travelable_route(way, tags):
-    # TODO: look at expanding these checks
-    if tags.get('visible', 'true') == 'false':
-        return False
-    if tags.get('highway') in ('trunk', 'trunk_link', 'primary', 'primary_link', 'secondary',  'secondary_link', 'tertiary', 'tertiary_link', 'unclassified', 'road', 'cycleway'):
-        return True
-    if tags.get('cycleway'):
-        return True
-    return False
+def travelable_route(way, tags, rules=DEFAULT_RULES):
+    return rules.classify(tags)[2]
 
 
 def distance_between(alat, alon, blat, blon):
@@ -44,16 +45,16 @@ class Node:
         self.nid = int(nid)
         self.way = False
 
-    def apply_tags(self, tags):
-        # TODO: refine these more
-        if any(t in tags for t in ('historic', 'leisure', 'natural', 'tourism', 'amenity', 'sport')):
-            self.interest = 1
-        elif tags.get('building') in ('hotel', 'cathedral', 'chapel', 'church', 'university'):
-            self.interest = 1
-        if (tags.get('building') == 'hotel' or
-                tags.get('tourism') in ('alpine_hut', 'camp_site', 'chalet', 'guest_house', 'hostel', 'hotel', 'motel', 'wilderness_hut')):
+    def apply_tags(self, tags, rules=DEFAULT_RULES):
+        """ Take the interest and rest of the node from its tags, returning
+            if the rules close it
+        """
+        interest, rest, self.way, closed = rules.classify(tags)
+        if interest:
+            self.interest = interest
+        if rest:
             self.rest = True
-        self.way = travelable_route(None, tags)
+        return closed
 
     def cost_to(self, node):
         if node:
@@ -87,16 +88,29 @@ class NodeDB:
                         (node.nid, node.lat, node.lon, node.interest, node.rest))
         self.db.commit()
 
+    def create_nodes(self, rows):
+        """ Add many nodes at once, rows being (id, lat, lon, interest, rest) """
+        self.db.executemany('INSERT INTO nodes VALUES (?, ?, ?, ?, ?, 0, 0)', rows)
+        self.db.commit()
+
     def get_node(self, nodeid):
         dbc = self.db.cursor()
         dbc.execute('SELECT lat, lon, id, interest, rest FROM nodes WHERE id=?', (nodeid, ))
         return Node(*dbc.fetchone())
 
+    def has_node(self, nodeid):
+        dbc = self.db.cursor()
+        dbc.execute('SELECT 1 FROM nodes WHERE id=?', (nodeid, ))
+        return dbc.fetchone() is not None
+
     def mark_as_route(self, nodeid):
         dbc = self.db.cursor()
-        dbc.execute('SELECT is_way FROM nodes WHERE id=?', (nodeid, ))
-        newval = dbc.fetchone()[0] +1
-        dbc.execute('UPDATE nodes SET is_way=? WHERE id=?', (newval, nodeid))
+        dbc.execute('UPDATE nodes SET is_way=is_way+1 WHERE id=?', (nodeid, ))
+        self.db.commit()
+
+    def set_route_counts(self, counts):
+        """ Set how many ways each node is part of, counts being (id, ways) """
+        self.db.executemany('UPDATE nodes SET is_way=? WHERE id=?', ((ways, nid) for nid, ways in counts))
         self.db.commit()
 
     def load_intersections(self):
@@ -135,6 +149,37 @@ class NodeDB:
         self.db = None
 
 
+class CoordinateStore:
+    """ The positions of OSM nodes, as flat arrays sorted by node id
+
+        Far smaller than keeping a Node for each, and shared by the edges
+        running each way along a road
+    """
+    def __init__(self, points=()):
+        """ points  (nid, lat, lon) for each node """
+        points = sorted(points)
+        self.ids = array('q', (nid for nid, _, _ in points))
+        self.lats = array('d', (lat for _, lat, _ in points))
+        self.lons = array('d', (lon for _, _, lon in points))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def find(self, nid):
+        i = bisect_left(self.ids, nid)
+        return i if i < len(self.ids) and self.ids[i] == nid else None
+
+    def __contains__(self, nid):
+        return self.find(nid) is not None
+
+    def __getitem__(self, nid):
+        """ The (lat, lon) of a node """
+        i = self.find(nid)
+        if i is None:
+            raise KeyError(nid)
+        return self.lats[i], self.lons[i]
+
+
 class RouteIntersection:
     def __init__(self, node):
         self.position = node.lat, node.lon
@@ -158,24 +203,29 @@ class RouteEdge:
 
 
 class OSMHandler(ContentHandler):
-    def __init__(self, box_size=0.002):
+    def __init__(self, box_size=0.002, rules=None):
         self.node = None
         self.way = None
         self.ways = []
         self.tags = {}
         self.nds = []
         self.graph = Graph()
-        self.db = NodeDB(':memory:')
+        self.db = self.open_store()
         self.count = 0
         self.box_size = box_size
+        self.rules = rules if rules else DEFAULT_RULES
         self.start = time()
 
+    def open_store(self):
+        """ The NodeDB to hold the nodes while they are loaded """
+        return NodeDB(':memory:')
+
     def startElement(self, name, attributes):
         if name == 'node':
             self.node = (int(attributes['id']), Node(attributes['lat'], attributes['lon'], attributes['id']))
             self.tags = {}
         elif name == 'tag':
-            self.tags[attributes['k'].lower()] = attributes['v'].lower()
+            self.tags[intern(attributes['k'].lower())] = attributes['v'].lower()
         elif name =='way':
             self.way = {'id':int(attributes['id'])}
             self.nds = []
@@ -186,9 +236,8 @@ class OSMHandler(ContentHandler):
     def endElement(self, name):
         steps = 100000
         if name == 'node':
-            self.node[1].apply_tags(self.tags)
-            if self.tags.get('visible', 'true') != 'false':
-                self.db.create_node(*self.node)
+            if not self.node[1].apply_tags(self.tags, self.rules):
+                self.add_node(self.node[1])
                 self.count += 1
                 if not self.count%steps:
                     print(self.count, 'nodes', time()-self.start)
@@ -197,10 +246,8 @@ class OSMHandler(ContentHandler):
         elif name == 'way':
             self.way['nodes'] = self.nds
             self.way['tags'] = self.tags
-            if travelable_route(self.way, self.tags):
-                for node in set(self.nds):
-                    self.db.mark_as_route(node)
-                self.ways.append(self.way)
+            if travelable_route(self.way, self.tags, self.rules):
+                self.add_way(self.way)
                 self.count += 1
                 if not self.count%steps:
                     print(self.count, 'ways', time()-self.start)
@@ -208,14 +255,56 @@ class OSMHandler(ContentHandler):
             self.tags = {}
             self.way = None
 
+    def add_node(self, node):
+        self.db.create_node(node.nid, node)
+
+    def add_way(self, way):
+        for part in usable_parts(way, self.db.has_node):
+            for node in set(part['nodes']):
+                self.db.mark_as_route(node)
+            self.ways.append(part)
+
+    def stitch(self, extracts):
+        """ Add the nodes and ways parsed from several extracts, those on the
+            boundaries that are in more than one only once
+
+            extracts    (nodes, ways) of each extract as parsed by an ExtractHandler
+
+            As an extract can cut a way short at its boundary, the copies of a
+            way in more than one extract are joined where they overlap, see
+            join_copies. Ways are split at nodes none of the extracts have,
+            such as those closed by the rules
+        """
+        nodes, copies = {}, {}
+        for extract_nodes, extract_ways in extracts:
+            for row in extract_nodes:
+                nodes.setdefault(row[0], row)
+            for way in extract_ways:
+                copies.setdefault(way['id'], []).append(way)
+        self.db.create_nodes(nodes.values())
+        for versions in copies.values():
+            if len(versions) == 1:
+                ways = versions
+            else:
+                ways = [dict(versions[0], nodes=joined) for joined in join_copies([w['nodes'] for w in versions])]
+            for way in ways:
+                self.ways.extend(usable_parts(way, nodes.__contains__))
+        self.db.set_route_counts(Counter(nid for way in self.ways for nid in set(way['nodes'])).items())
+
     def endDocument(self):
         print("Done loading, starting processing", time()-self.start)
-        self.halo_interesting_points()
-        self.build_graph()
+        self.timings = {'parse': time()-self.start}
+        for phase, step in (('halo', self.halo_interesting_points), ('build', self.build_graph), ('simplify', self.finish)):
+            started = time()
+            step()
+            self.timings[phase] = time()-started
+        print("Done processing", time() - self.start)
+
+    def finish(self):
+        self.store_size = memory_report(db=self.db)[0][1]
         self.db.close()
         self.db = None
         self.improve_graph()
-        print("Done processing", time() - self.start)
 
     def halo_interesting_points(self):
         count, hits = 0, 0
@@ -227,15 +316,22 @@ class OSMHandler(ContentHandler):
             count += 1
             if not count % 1000:
                 print(count, 'haloing', time()-self.start)
-        print("Done Haloing, matched ", hits/count, " % ", time() - self.start)
+        print("Done Haloing, matched ", hits/count if count else 0, " % ", time() - self.start)
 
     def build_graph(self):
         intersections = set(self.db.load_intersections())
         for n in intersections:
             self.graph.set_node(n, RouteIntersection(self.db.get_node(n)))
+        positions = {}
+        def fetch(nid):
+            node = self.db.get_node(nid)
+            if node.nid not in intersections:
+                positions[node.nid] = node.lat, node.lon
+            return node
         for way in self.ways:
-            for a, edge, b in nodes_to_edges(intersections, map(self.db.get_node, way['nodes'])):
+            for a, edge, b in nodes_to_edges(intersections, map(fetch, way['nodes'])):
                 self.graph.add_edge(a, b, RouteEdge(edge))
+        self.graph.coordinates = CoordinateStore((nid, lat, lon) for nid, (lat, lon) in positions.items())
         print("Done coverting to graph", time() - self.start)
 
     def improve_graph(self):
@@ -250,6 +346,85 @@ class OSMHandler(ContentHandler):
         self.graph.simplify(combine_edges)
 
 
+class ExtractHandler(OSMHandler):
+    """ Parse an OSM extract into plain lists of its nodes and travelable
+        ways, to be stitched together with other extracts by an OSMHandler
+    """
+    def __init__(self, rules=None):
+        super().__init__(rules=rules)
+        self.nodes = []
+
+    def open_store(self):
+        # the nodes are only kept in a list, for an OSMHandler to stitch together
+        return None
+
+    def add_node(self, node):
+        self.nodes.append((node.nid, node.lat, node.lon, node.interest, node.rest))
+
+    def add_way(self, way):
+        self.ways.append(way)
+
+    def endDocument(self):
+        print("Done parsing", len(self.nodes), "nodes and", len(self.ways), "ways", time()-self.start)
+
+
+def join_copies(copies):
+    """ The node lists of a way pieced together from copies of it, each
+        holding a run of its nodes, as extracts cut at different places hold
+
+        Copies are joined where one holds the other or they overlap at their
+        ends, copies that still do not meet give separate parts
+    """
+    parts = []
+    for nodes in sorted(copies, key=len, reverse=True):
+        i = 0
+        while i < len(parts):
+            joined = overlap(parts[i], nodes)
+            if joined is None:
+                i += 1
+            else:
+                nodes = joined
+                del parts[i]
+                i = 0
+        parts.append(nodes)
+    return parts
+
+
+def overlap(a, b):
+    """ The nodes of a and b joined where they overlap, None if they do not """
+    if len(a) < len(b):
+        a, b = b, a
+    a, b = list(a), list(b)
+    if any(a[i:i+len(b)] == b for i in range(len(a)-len(b)+1)):
+        return a
+    for k in range(len(b)-1, 0, -1):
+        if a[-k:] == b[:k]:
+            return a+b[k:]
+        if b[-k:] == a[:k]:
+            return b+a[k:]
+    return None
+
+
+def usable_parts(way, usable):
+    """ The parts of way between the nodes it refers to that are not usable,
+        such as those closed by the rules or missing from the extract
+
+        Each part is a way of its own with the same id and tags, and parts of
+        a single node are dropped
+    """
+    if all(usable(nid) for nid in way['nodes']):
+        yield way
+        return
+    part = []
+    for nid in way['nodes'] + [None]:
+        if nid is not None and usable(nid):
+            part.append(nid)
+            continue
+        if len(part) > 1:
+            yield dict(way, nodes=part)
+        part = []
+
+
 def nodes_to_edges(intersections, nodes):
     previous, edge = None, []
     for point in nodes:
@@ -261,24 +436,93 @@ def nodes_to_edges(intersections, nodes):
             previous, edge = point.nid, [point]
 
 
-def load_graph(filename, halo_range):
-    with open(filename) as source:
-        osmhandler = OSMHandler(halo_range)
+def parse_osm(filename, halo_range, osmhandler=None):
+    """ Load an OSM extract, returning the handler with the graph and the timings of each phase
+
+        osmhandler  the OSMHandler to load with, a new one if not given
+    """
+    with (bz2.open(filename, 'rt') if filename.endswith('.bz2') else open(filename)) as source:
+        osmhandler = osmhandler if osmhandler else OSMHandler(halo_range)
         parser = sax.make_parser()
         parser.setContentHandler(osmhandler)
         parser.parse(source)
-        graph = osmhandler.graph
-        return graph
+        return osmhandler
+
+
+def _parse_extract(job):
+    filename, rules = job
+    extract = parse_osm(filename, None, ExtractHandler(rules))
+    return extract.nodes, extract.ways
+
+
+def parse_extracts(filenames, halo_range, osmhandler=None, workers=None, rules=None):
+    """ Load several OSM extracts as one graph, returning the handler as parse_osm does
+
+        The extracts are parsed side by side by worker processes (default
+        one per core, at most one per extract), then stitched together before
+        haloing, building and simplifying the graph. Stitching is timed apart
+        from parsing.
+
+        rules   the tagrules.TagRules to read tags with, unless osmhandler is given
+    """
+    osmhandler = osmhandler if osmhandler else OSMHandler(halo_range, rules)
+    if len(filenames) == 1:
+        return parse_osm(filenames[0], halo_range, osmhandler)
+    started = time()
+    with Pool(min(workers, len(filenames)) if workers else None) as pool:
+        extracts = pool.map(_parse_extract, [(filename, osmhandler.rules) for filename in filenames], chunksize=1)
+    parsed = time()
+    osmhandler.stitch(extracts)
+    stitched = time()
+    del extracts
+    osmhandler.endDocument()
+    osmhandler.timings.update(parse=parsed-started, stitch=stitched-parsed)
+    return osmhandler
+
+
+def load_graph(filenames, halo_range, workers=None, rules=None):
+    """ Load a graph from one OSM extract, or several given as a list or separated by commas """
+    if isinstance(filenames, str):
+        filenames = filenames.split(',')
+    return parse_extracts(filenames, halo_range, workers=workers, rules=rules).graph
+
+
+def unpickle_graph(filename):
+    """ Load a graph pickled by main.py makepickle """
+    with open(filename, 'rb') as source:
+        return pickle.load(source)
+
+
+def load_graph_file(filename, halo_range):
+    """ Load a graph from a pickle, or from OSM extracts as load_graph does
+
+        A single file starting as every pickle does is unpickled, whatever
+        it is called, anything else is parsed as OSM
+    """
+    if ',' not in filename:
+        with open(filename, 'rb') as source:
+            if source.read(1) == pickle.PROTO:
+                return unpickle_graph(filename)
+    return load_graph(filename, halo_range)
+
+
+def nearest_intersection(graph, lat, lon):
+    """ The id of the intersection in a loaded graph closest to (lat, lon) """
+    scale = cos(radians(lat))
+    def offset(nid):
+        nlat, nlon = graph[nid].position
+        return (nlat-lat)**2 + ((nlon-lon)*scale)**2
+    return min(graph, key=offset)
 
 
 if __name__ == '__main__':
     from docopt import docopt
     arguments = docopt(__doc__, version="osm data analyser")
-    osmhandler = OSMHandler()
+    osmhandler = OSMHandler(float(arguments['--halo']))
     parser = sax.make_parser()
     parser.setContentHandler(osmhandler)
-    parser.parse(arguments['<inputfile>'], float(arguments['--halo']))
-    print("Way size {0:,d}kb".format(total_size(osmhandler.ways)//1024))
+    parser.parse(arguments['<inputfile>'])
+    print(format_report(memory_report(osmhandler.graph, ways=osmhandler.ways)+[('node store', osmhandler.store_size)]))
     print("Total ways", len(osmhandler.ways))
     print("Total graph nodes", len(osmhandler.graph))
     print("Connected components", osmhandler.graph.connected_components())
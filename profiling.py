@@ -0,0 +1,143 @@
+""" Profile each phase of a search separately
+
+    Every phase has its own cProfile profile, and only the innermost phase
+    running is profiled, so time spent halo-ing while the OSM file is still
+    being parsed counts towards halo and not parse. Alongside the profiles a
+    thread samples the stack of the main thread every few milliseconds,
+    giving the collapsed stacks that flame graph tools read.
+"""
+import cProfile
+from collections import Counter
+from functools import wraps
+import os
+import pstats
+import sys
+import threading
+
+
+class PhaseProfiler:
+    """ Profiles of the phases of a search
+
+        interval    seconds between samples of the stack, None to not sample
+    """
+    def __init__(self, interval=0.005):
+        self.profiles = {}
+        self.stacks = {}
+        self.running = []
+        self.interval = interval
+        self.sampler = None
+        self.stopped = threading.Event()
+
+    def start(self):
+        """ Start sampling the stack of the calling thread """
+        if self.interval and self.sampler is None:
+            self.stopped.clear()
+            self.sampler = threading.Thread(target=self.sample, args=(threading.get_ident(),), daemon=True)
+            self.sampler.start()
+
+    def stop(self):
+        if self.sampler is not None:
+            self.stopped.set()
+            self.sampler.join()
+            self.sampler = None
+
+    def sample(self, thread):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(thread)
+            if frame is None or not self.running:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append("{} ({}:{})".format(code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+                frame = frame.f_back
+            self.stacks.setdefault(self.running[-1], Counter())[";".join(reversed(stack))] += 1
+
+    def enter(self, name):
+        """ Start profiling a phase, pausing the one it is part of """
+        if self.running:
+            self.profiles[self.running[-1]].disable()
+        self.running.append(name)
+        self.profiles.setdefault(name, cProfile.Profile()).enable()
+
+    def leave(self):
+        """ Finish profiling the current phase, resuming the one it is part of """
+        self.profiles[self.running.pop()].disable()
+        if self.running:
+            self.profiles[self.running[-1]].enable()
+
+    def wrap(self, name, function):
+        """ function, profiled as part of the phase name whenever it is called
+
+            Generators are run to the end within the phase, and their
+            results returned as a list
+        """
+        @wraps(function)
+        def profiled(*args, **kwargs):
+            self.enter(name)
+            try:
+                result = function(*args, **kwargs)
+                if hasattr(result, '__next__'):
+                    result = list(result)
+                return result
+            finally:
+                self.leave()
+        return profiled
+
+    def save(self, folder):
+        """ Write a .pstats file and a .collapsed file of sampled stacks for every phase to folder """
+        os.makedirs(folder, exist_ok=True)
+        for name, profile in self.profiles.items():
+            profile.dump_stats(os.path.join(folder, name+'.pstats'))
+        for name, stacks in self.stacks.items():
+            with open(os.path.join(folder, name+'.collapsed'), 'w') as sink:
+                for stack, count in stacks.most_common():
+                    sink.write("{} {}\n".format(stack, count))
+
+    def summary(self, top=10):
+        """ The total time of each phase and its top functions by time spent in them """
+        lines = []
+        for name, profile in self.profiles.items():
+            stats = pstats.Stats(profile).stats
+            total = sum(tt for _, _, tt, _, _ in stats.values())
+            lines.append("{} {:.3f}s".format(name, total))
+            for (filename, line, function), (_, calls, tt, ct, _) in sorted(stats.items(), key=lambda s: s[1][2], reverse=True)[:top]:
+                lines.append("  {:8.3f}s {:8.3f}s {:>9} {}:{}({})".format(tt, ct, calls, os.path.basename(filename), line, function))
+        return "\n".join(lines)
+
+
+def profile_loading(profiler, handler):
+    """ Profile the phases of loading OSM data with handler, the rest of the load counts as parse """
+    for name, method in (('halo', 'halo_interesting_points'), ('build', 'build_graph'), ('simplify', 'finish')):
+        setattr(handler, method, profiler.wrap(name, getattr(handler, method)))
+    return handler
+
+
+def profile_swarm(profiler, swarm, analytics):
+    """ Profile the phases of a search by swarm, returning the analysers wrapped to be profiled """
+    for name, method in (('setup_graph', 'setup_graph'), ('travel', 'run_generation'),
+                         ('deposit', 'deposit'), ('evaporate', 'evaporate')):
+        if hasattr(swarm, method):
+            setattr(swarm, method, profiler.wrap(name, getattr(swarm, method)))
+    return [Profiled(profiler, an) for an in analytics]
+
+
+class Profiled:
+    """ An analyser profiled as part of the analysis phase """
+    def __init__(self, profiler, analyser):
+        self.analyser = analyser
+        self.profiled = profiler.wrap('analysis', analyser)
+
+    def __call__(self, graph, gen, ants, *summary):
+        return self.profiled(graph, gen, ants, *summary)
+
+    def __getattr__(self, name):
+        if name == 'analyser':
+            raise AttributeError(name)
+        return getattr(self.analyser, name)
+
+    def __bool__(self):
+        return bool(self.analyser)
+
+    def __str__(self):
+        return str(self.analyser)
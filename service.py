@@ -0,0 +1,219 @@
+#! /usr/bin/python3
+"""
+    Usage:
+        service.py [options] <graphfile>...
+
+    Keep graphs loaded and answer route searches over HTTP, so a request only
+    waits for its own search.
+
+    <graphfile>                         OSM extracts (.osm or .osm.bz2) or pickled graphs to serve, each
+                                        named after its file, or name=file to choose the name. Several
+                                        extracts separated by commas are stitched into one graph
+
+    --host <host>                       Address to listen on [default: 127.0.0.1]
+    -p <port>, --port <port>            Port to listen on [default: 8080]
+    --socket <path>                     Listen on this Unix socket instead
+    -w <workers>, --workers <workers>   Worker processes searching each graph [default: 1]
+    -q <queue>, --queue <queue>         Requests that can wait for a worker before more are turned away [default: 8]
+    -t <seconds>, --timeout <seconds>   Longest a request can take, searches are cut short to fit [default: 60]
+    --cache <results>                   Results of seeded searches to remember for each graph, 0 to not [default: 1000]
+    --cache-dir <folder>                Also save results in this folder, so they outlive the service
+    --halo <range>                      How far to project interesting points on to routes [default: 0.002]
+
+    POST /route/<name> with a JSON object of the fields of a batch.RouteRequest,
+    start being a node id or [lat, lon], to search the graph name.
+    GET /graphs lists the graphs being served.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from multiprocessing import TimeoutError
+import os
+from socketserver import ThreadingUnixStreamServer
+import threading
+
+from aco import BasicAnt
+import batch
+from cache import ResultCache
+import osm
+
+
+class Busy(Exception):
+    """ Every worker is searching and the queue is full """
+
+
+class RouteService:
+    """ Answer RouteRequests over graphs that stay loaded
+
+        graphs      a dict of the graphs to serve by name
+        workers     worker processes searching each graph
+        queue       requests that can wait for a worker on top of those
+                    being searched, before more are turned away
+        timeout     seconds a request can take, including waiting for a
+                    worker. Searches are given a time limit of no more than
+                    this, so a request that times out frees its worker soon
+                    after
+        cache       how many results of seeded searches to remember for
+                    each graph, 0 to not
+        folder      where to also save the results, in a folder for each graph
+    """
+    def __init__(self, graphs, workers=1, queue=8, timeout=60, Ant=BasicAnt, cache=0, folder=None):
+        self.timeout = timeout
+        self.sizes = {name: len(graph) for name, graph in graphs.items()}
+        self.pools, self.slots, self.caches = {}, {}, {}
+        for name, graph in graphs.items():
+            self.pools[name] = batch.worker_pool(graph, workers, Ant)
+            self.slots[name] = threading.BoundedSemaphore(workers+queue)
+            if cache:
+                self.caches[name] = ResultCache(graph, cache, os.path.join(folder, name) if folder else None)
+
+    def route(self, name, request):
+        """ Search graph name for request
+
+            raises KeyError for an unknown graph, Busy if too many requests
+            are waiting and multiprocessing.TimeoutError if it takes too long
+        """
+        pool, slots = self.pools[name], self.slots[name]
+        cache = self.caches.get(name)
+        if cache is not None:
+            result = cache.get(request)
+            if result is not None:
+                return result
+        if not slots.acquire(blocking=False):
+            raise Busy(name)
+        asked = request
+        if self.timeout:
+            request = request._replace(time=min(request.time or self.timeout, self.timeout))
+        release = lambda _: slots.release()
+        # the slot is only freed once the search has finished, even if the request has timed out
+        result = pool.apply_async(batch.search_in_worker, (request,), callback=release, error_callback=release).get(self.timeout)
+        result = result._replace(request=asked)
+        if cache is not None:
+            cache.put(result)
+        return result
+
+    def close(self):
+        """ Shut down the worker pools """
+        for pool in self.pools.values():
+            pool.terminate()
+            pool.join()
+        self.pools = {}
+
+
+def parse_request(body):
+    """ A RouteRequest from the JSON body of a request, raising ValueError if it is not one """
+    fields = json.loads(body)
+    if not isinstance(fields, dict) or 'start' not in fields:
+        raise ValueError("a route request needs a start")
+    unknown = set(fields)-set(batch.RouteRequest._fields)
+    if unknown:
+        raise ValueError("unknown fields " + ", ".join(sorted(unknown)))
+    if isinstance(fields['start'], list):
+        fields['start'] = tuple(fields['start'])
+    return batch.RouteRequest(**fields)
+
+
+def result_to_json(result):
+    """ A RouteResult as a JSON object """
+    fields = result._asdict()
+    fields['request'] = result.request._asdict()
+    return json.dumps(fields)
+
+
+class RouteHandler(BaseHTTPRequestHandler):
+    """ The HTTP API of the RouteService of the server """
+    def reply(self, status, body):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def error(self, status, message):
+        self.reply(status, json.dumps({'error': message}))
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/graphs':
+            self.reply(200, json.dumps({'graphs': {name: {'nodes': size} for name, size in self.server.service.sizes.items()}}))
+        else:
+            self.error(404, "not found")
+
+    def do_POST(self):
+        parts = self.path.strip('/').split('/')
+        if len(parts) != 2 or parts[0] != 'route':
+            return self.error(404, "not found")
+        if parts[1] not in self.server.service.pools:
+            return self.error(404, "no graph called " + parts[1])
+        try:
+            request = parse_request(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        except (ValueError, TypeError) as e:
+            return self.error(400, str(e))
+        try:
+            result = self.server.service.route(parts[1], request)
+        except Busy:
+            return self.error(503, "too many requests waiting")
+        except TimeoutError:
+            return self.error(504, "timed out")
+        except (KeyError, ValueError, TypeError) as e:
+            return self.error(400, "could not search: {!r}".format(e))
+        except Exception as e:
+            return self.error(500, "search failed: {!r}".format(e))
+        self.reply(200, result_to_json(result))
+
+    def address_string(self):
+        # clients of a Unix socket have no address
+        return self.client_address[0] if self.client_address else self.server.server_address
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class RouteServer(ThreadingHTTPServer):
+    """ Serve a RouteService over HTTP, each request in its own thread """
+    daemon_threads = True
+
+    def __init__(self, address, service, verbose=False):
+        self.service = service
+        self.verbose = verbose
+        super().__init__(address, RouteHandler)
+
+
+class UnixRouteServer(ThreadingUnixStreamServer):
+    """ Serve a RouteService over HTTP on a Unix socket """
+    daemon_threads = True
+
+    def __init__(self, path, service, verbose=False):
+        self.service = service
+        self.verbose = verbose
+        super().__init__(path, RouteHandler)
+
+
+def graph_name(argument):
+    """ (name, filename) of a graphfile argument """
+    if '=' in argument:
+        return tuple(argument.split('=', 1))
+    return os.path.basename(argument).split('.')[0], argument
+
+
+if __name__ == '__main__':
+    from docopt import docopt
+    arguments = docopt(__doc__)
+    halo = float(arguments['--halo'])
+    graphs = {name: osm.load_graph_file(filename, halo) for name, filename in map(graph_name, arguments['<graphfile>'])}
+    service = RouteService(graphs, int(arguments['--workers']), int(arguments['--queue']), float(arguments['--timeout']),
+                           cache=int(arguments['--cache']), folder=arguments['--cache-dir'])
+    if arguments['--socket']:
+        server = UnixRouteServer(arguments['--socket'], service, verbose=True)
+    else:
+        server = RouteServer((arguments['--host'], int(arguments['--port'])), service, verbose=True)
+    print("Serving", ", ".join(graphs), "on", server.server_address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if arguments['--socket']:
+            os.remove(arguments['--socket'])
@@ -1,12 +1,29 @@
 from sys import getsizeof, stderr
 from itertools import chain
 from collections import deque
+from random import Random
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
 try:
         from reprlib import repr
 except ImportError:
         pass
 
-def total_size(o, handlers={}, verbose=False):
+# shared by everything that uses them, so never counted as part of an object
+SHARED = (type, ModuleType, FunctionType, BuiltinFunctionType, MethodType)
+
+
+def attributes(o):
+    """ The values of the instance attributes of o, its __dict__ and any __slots__ """
+    values = [o.__dict__] if hasattr(o, '__dict__') and not isinstance(o, SHARED) else []
+    for cls in type(o).__mro__:
+        slots = cls.__dict__.get('__slots__', ())
+        for name in [slots] if isinstance(slots, str) else slots:
+            if name not in ('__dict__', '__weakref__') and hasattr(o, name):
+                values.append(getattr(o, name))
+    return values
+
+
+def total_size(o, handlers={}, verbose=False, exclude=()):
     """ Returns the approximate memory footprint an object and all of its contents.
 
         Automatically finds the contents of the following builtin containers and
@@ -16,6 +33,9 @@ def total_size(o, handlers={}, verbose=False):
         handlers = {SomeContainerClass: iter,
         OtherContainerClass: OtherContainerClass.get_elements}
 
+        Any other object is searched through its __dict__ and __slots__,
+        apart from classes, modules and functions. Nothing in exclude, or
+        inside it, is counted.
     """
     dict_handler = lambda d: chain.from_iterable(d.items())
     all_handlers = {tuple: iter,
@@ -26,7 +46,7 @@ def total_size(o, handlers={}, verbose=False):
                     frozenset: iter,
                     }
     all_handlers.update(handlers)     # user handlers take precedence
-    seen = set()                      # track which object id's have already been seen
+    seen = set(map(id, exclude))      # track which object id's have already been seen
     default_size = getsizeof(0)       # estimate sizeof object without __sizeof__
 
     def sizeof(o):
@@ -42,6 +62,87 @@ def total_size(o, handlers={}, verbose=False):
             if isinstance(o, typ):
                 s += sum(map(sizeof, handler(o)))
                 break
+        else:
+            if not isinstance(o, SHARED):
+                s += sum(map(sizeof, attributes(o)))
         return s
 
     return sizeof(o)
+
+
+def estimate(items, count, measure, sample=1000, seed=0):
+    """ Estimate the total of measure over count items by measuring a sample
+
+        items       an iterable of the items, only read as far as needed
+        count       how many items there are
+        measure     gives the size of a single item
+
+        The sample is the first items of a random subset, the whole of them
+        if there are no more than sample, so small collections are exact
+    """
+    if count <= sample:
+        return sum(map(measure, items))
+    picks = sorted(Random(seed).sample(range(count), sample))
+    chosen, wanted = [], iter(picks)
+    target = next(wanted)
+    for i, item in enumerate(items):
+        if i == target:
+            chosen.append(item)
+            target = next(wanted, None)
+            if target is None:
+                break
+    return sum(map(measure, chosen))*count//sample
+
+
+def memory_report(graph=None, trail=None, ants=(), ways=None, db=None, sample=1000):
+    """ Break down where the memory of a search goes
+
+        graph   a loaded graph, split into its nodes, its adjacency lists, the
+                edges themselves and the lists of OSM node ids along them
+        trail   the pheromone trail
+        ants    the population of a swarm
+        ways    the ways kept while loading OSM data
+        db      the NodeDB used while loading OSM data
+
+        Collections of more than sample items are estimated from a sample
+
+        returns a list of (part, bytes)
+    """
+    report = []
+    if graph is not None:
+        def node(nid):
+            return total_size(graph.node_info[nid], exclude=[trail])
+        def adjacency(nid):
+            links = graph.node_links.get(nid, {})
+            return getsizeof(links)+sum(getsizeof(edges) for edges in links.values())
+        def edges(nid):
+            return sum(total_size(e, exclude=[trail, getattr(e, 'nid', None)])
+                       for es in graph.node_links.get(nid, {}).values() for e in es)
+        def edge_nodes(nid):
+            return sum(total_size(e.nid) for es in graph.node_links.get(nid, {}).values() for e in es if hasattr(e, 'nid'))
+        count = len(graph)
+        report.append(('graph nodes', getsizeof(graph.node_info)+estimate(iter(graph), count, node, sample)))
+        report.append(('graph adjacency', getsizeof(graph.node_links)+estimate(iter(graph), count, adjacency, sample)))
+        report.append(('graph edges', estimate(iter(graph), count, edges, sample)))
+        report.append(('edge node ids', estimate(iter(graph), count, edge_nodes, sample)))
+        if graph.coordinates is not None:
+            store = graph.coordinates
+            report.append(('coordinates', getsizeof(store)+sum(getsizeof(a) for a in (store.ids, store.lats, store.lons))))
+    if trail is not None:
+        report.append(('pheromone trail', getsizeof(trail)+getsizeof(trail.levels)))
+    if ants:
+        report.append(('ants', getsizeof(ants)+estimate(iter(ants), len(ants), total_size, sample)))
+    if ways is not None:
+        report.append(('ways', getsizeof(ways)+estimate(iter(ways), len(ways), total_size, sample)))
+    if db is not None:
+        pages = db.db.execute('PRAGMA page_count').fetchone()[0]
+        report.append(('node store', pages*db.db.execute('PRAGMA page_size').fetchone()[0]))
+    return report
+
+
+def format_report(report):
+    """ The report as lines of text, biggest part first """
+    total = sum(size for _, size in report)
+    lines = ["{:<16} {:>12,d}kb {:5.1f}%".format(part, size//1024, 100*size/total if total else 0)
+             for part, size in sorted(report, key=lambda p: p[1], reverse=True)]
+    return "\n".join(lines+["{:<16} {:>12,d}kb".format('total', total//1024)])
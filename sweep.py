@@ -0,0 +1,148 @@
+#! /usr/bin/python3
+"""
+    Usage:
+        sweep.py (osm <osmfile> | pickle <picklefile>) [options] [<summaryfile>]
+        sweep.py -h | --help
+
+    Values for each parameter are a comma separated list, every combination
+    of which is searched. With --random only that many combinations are
+    searched, each picked at random, and a parameter can instead be given as
+    a lo:hi range to draw from.
+
+    -a <values>, --alpha <values>       Alpha values for ACO [default: 1]
+    -b <values>, --beta <values>        Beta values for ACO [default: 1]
+    -e <evap>, --evaporation <evap>     Evaporation values [default: 0.75]
+    -s <values>, --size <values>        Swarm sizes [default: 50]
+    -r <values>, --rest <values>        Rest periods [default: 100]
+    -u <values>, --update <values>      Pheromone updates [default: all]
+
+    --random <n>                        Search n random combinations instead of all of them
+    --runs <runs>                       Seeded searches of each combination [default: 3]
+    --seed <seed>                       Seed of the first search of each combination [default: 1]
+    -w <workers>, --workers <workers>   Worker processes to search on, one per core if not given
+
+    -m <dist>, --max <dist>             Max distance [default: 300]
+    -g <gen>, --generations <gen>       Maximum number of Generations [default: 20]
+    --patience <gen>                    Stop once the best route has not improved for this many generations
+    --start <nid>                       Node to start from, the most connected node if not given
+    --halo <range>                      How far to project interesting points on to routes [default: 0.002]
+"""
+import csv
+from itertools import product
+from random import Random
+
+from batch import BatchSearch, RouteRequest
+import osm
+
+
+PARAMETERS = (('alpha', float), ('beta', float), ('evaporation', float), ('size', int), ('rest', int), ('update', str))
+
+
+def parse_space(config):
+    """ The values or (lo, hi) range to try for every swept parameter """
+    space = {}
+    for name, kind in PARAMETERS:
+        value = config['--'+name]
+        if ':' in value:
+            space[name] = tuple(kind(v) for v in value.split(':'))
+        else:
+            space[name] = [kind(v) for v in value.split(',')]
+    return space
+
+
+def grid(space):
+    """ Every combination of the values in space """
+    if any(isinstance(values, tuple) for values in space.values()):
+        raise ValueError("lo:hi ranges can only be used with --random")
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in product(*(space[n] for n in names))]
+
+
+def random_combinations(space, count, rng):
+    """ count combinations drawn from space, ranges are drawn uniformly """
+    def draw(values):
+        if not isinstance(values, tuple):
+            return rng.choice(values)
+        lo, hi = values
+        return rng.randint(lo, hi) if isinstance(lo, int) else rng.uniform(lo, hi)
+    return [{name: draw(values) for name, values in sorted(space.items())} for _ in range(count)]
+
+
+def summarise(combination, results):
+    """ A summary row for all the searches of one combination """
+    runs = len(results)
+    seconds = sum(r.seconds for r in results)
+    ants = sum(r.generations*r.request.size for r in results)
+    found = [r.time_to_best for r in results if r.time_to_best is not None]
+    row = dict(combination)
+    row.update({
+        'runs': runs,
+        'best score': max(r.score for r in results),
+        'mean score': sum(r.score for r in results)/runs,
+        'mean time to best': sum(found)/len(found) if found else None,
+        'mean generations': sum(r.generations for r in results)/runs,
+        'ants/sec': ants/seconds if seconds else None,
+    })
+    return row
+
+
+def sweep(searcher, combinations, runs, seed, **fixed):
+    """ Search every combination runs times with the same seeds
+
+        searcher    a BatchSearch over the graph
+        fixed       any other RouteRequest fields, shared by every search
+
+        returns a summary row for each combination
+    """
+    requests = [RouteRequest(seed=seed+run, **dict(fixed, **combination))
+                for combination in combinations for run in range(runs)]
+    results = searcher(requests)
+    return [summarise(combination, results[i*runs:(i+1)*runs]) for i, combination in enumerate(combinations)]
+
+
+def write_summary(filename, rows):
+    """ Save the summary rows as a CSV file """
+    with open(filename, 'w', newline='') as sink:
+        writer = csv.DictWriter(sink, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def display_summary(rows):
+    """ Print the summary rows, best mean score first """
+    headers = list(rows[0])
+    print("\t".join(headers))
+    for row in sorted(rows, key=lambda r: r['mean score'], reverse=True):
+        print("\t".join("{:.3f}".format(row[h]) if isinstance(row[h], float) else str(row[h]) for h in headers))
+
+
+def load_graph(config):
+    """ Load the graph to sweep over as main.py would """
+    if config['osm']:
+        return osm.load_graph(config['<osmfile>'], float(config['--halo']))
+    return osm.unpickle_graph(config['<picklefile>'])
+
+
+if __name__ == '__main__':
+    from docopt import docopt
+    config = docopt(__doc__)
+    space = parse_space(config)
+    runs, seed = int(config['--runs']), int(config['--seed'])
+    if config['--random']:
+        combinations = random_combinations(space, int(config['--random']), Random(seed))
+    else:
+        combinations = grid(space)
+    graph = load_graph(config)
+    start = int(config['--start']) if config['--start'] else graph.find_most_connected_nodes()[0]
+    patience = int(config['--patience']) if config['--patience'] else None
+    workers = int(config['--workers']) if config['--workers'] else None
+    print("Searching", len(combinations), "combinations", runs, "times each from", start)
+    searcher = BatchSearch(graph, workers)
+    try:
+        rows = sweep(searcher, combinations, runs, seed, start=start, max_distance=int(config['--max']),
+                     generations=int(config['--generations']), patience=patience)
+    finally:
+        searcher.close()
+    display_summary(rows)
+    if config['<summaryfile>']:
+        write_summary(config['<summaryfile>'], rows)
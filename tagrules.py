@@ -0,0 +1,144 @@
+""" What the tags of OSM nodes and ways mean for a route
+
+    The rules are plain data, a dict of categories each mapping tag keys to
+    the values they match:
+
+        route       ways that can be cycled along
+        closed      ways and nodes that can not be used, whatever else they match
+        interest    nodes worth passing, and how much
+        rest        nodes that are somewhere to stop for the night
+
+    A key maps to ANY to match any value, a tuple of values, or for interest
+    a dict of values to their weights or a number to weigh any value by.
+    Empty values match nothing. The interest of something matching several
+    rules is the greatest of their weights.
+
+    TagRules compiles them into a table by key of what each value means, so
+    the tags of an element are classified in a single pass over them.
+"""
+import json
+
+ANY = '*'
+
+DEFAULT_RULES = {
+    'route': {
+        'highway': ('trunk', 'trunk_link', 'primary', 'primary_link', 'secondary', 'secondary_link',
+                    'tertiary', 'tertiary_link', 'unclassified', 'road', 'cycleway'),
+        'cycleway': ANY,
+    },
+    'closed': {
+        'visible': ('false',),
+    },
+    'interest': {
+        'historic': 1, 'leisure': 1, 'natural': 1, 'tourism': 1, 'amenity': 1, 'sport': 1,
+        'building': {'hotel': 1, 'cathedral': 1, 'chapel': 1, 'church': 1, 'university': 1},
+    },
+    'rest': {
+        'building': ('hotel',),
+        'tourism': ('alpine_hut', 'camp_site', 'chalet', 'guest_house', 'hostel', 'hotel', 'motel', 'wilderness_hut'),
+    },
+}
+
+# what an element matching no rules is, (interest, rest, route, closed)
+NOTHING = (0, False, False, False)
+
+
+def weights(category, match):
+    """ {value: weight} for what a key matches in category, ANY standing for any value
+
+        raises ValueError if match is not one of the forms described above
+    """
+    if match == ANY:
+        return {ANY: 1}
+    if isinstance(match, bool):
+        raise ValueError("{} rules can not match {!r}".format(category, match))
+    if isinstance(match, (int, float)):
+        if category != 'interest':
+            raise ValueError("only interest rules have weights")
+        return {ANY: match}
+    if isinstance(match, str):
+        return {match: 1}
+    if isinstance(match, dict):
+        if category != 'interest' and set(match.values()) - {1}:
+            raise ValueError("only interest rules have weights")
+        result = dict(match)
+    elif isinstance(match, (tuple, list)):
+        result = {value: 1 for value in match}
+    else:
+        raise ValueError("{} rules can not match {!r}".format(category, match))
+    for value, weight in result.items():
+        if not isinstance(value, str):
+            raise ValueError("{} rules can not match the value {!r}".format(category, value))
+        if isinstance(weight, bool) or not isinstance(weight, (int, float)):
+            raise ValueError("{} is not a weight for {!r}".format(weight, value))
+    return result
+
+
+def combine(a, b):
+    """ What something matching both outcomes is """
+    return max(a[0], b[0]), a[1] or b[1], a[2] or b[2], a[3] or b[3]
+
+
+def outcome(category, weight):
+    return {'interest': (weight, False, False, False),
+            'rest': (0, True, False, False),
+            'route': (0, False, True, False),
+            'closed': (0, False, False, True)}[category]
+
+
+class TagRules:
+    """ A set of rules compiled for classifying tags
+
+        rules   a dict of categories as described above, the defaults if None
+    """
+    def __init__(self, rules=None):
+        self.rules = DEFAULT_RULES if rules is None else rules
+        unknown = set(self.rules)-{'route', 'closed', 'interest', 'rest'}
+        if unknown:
+            raise ValueError("unknown categories " + ", ".join(sorted(unknown)))
+        # key -> ({value: outcome}, outcome of any other value)
+        matches = {}
+        for category, keys in self.rules.items():
+            for key, match in keys.items():
+                values = matches.setdefault(key.lower(), {})
+                for value, weight in weights(category, match).items():
+                    value = value if value == ANY else value.lower()
+                    values[value] = combine(values.get(value, NOTHING), outcome(category, weight))
+        self.table = {}
+        for key, values in matches.items():
+            default = values.pop(ANY, NOTHING)
+            self.table[key] = ({value: combine(default, result) for value, result in values.items()}, default)
+
+    @classmethod
+    def load(cls, filename):
+        """ Rules from a JSON file """
+        with open(filename) as source:
+            return cls(json.load(source))
+
+    def classify(self, tags):
+        """ (interest, rest, route, closed) of an element with tags, route
+            being if a way with them can be cycled along and closed if the
+            element can not be used at all
+        """
+        interest, rest, route, closed = NOTHING
+        table = self.table
+        for key, value in tags.items():
+            entry = table.get(key)
+            if entry is None or not value:
+                continue
+            i, r, ro, c = entry[0].get(value, entry[1])
+            if i > interest:
+                interest = i
+            rest = rest or r
+            route = route or ro
+            closed = closed or c
+        return interest, rest, route and not closed, closed
+
+    def __getstate__(self):
+        return self.rules
+
+    def __setstate__(self, rules):
+        self.__init__(rules)
+
+
+DEFAULT = TagRules()
@@ -0,0 +1,259 @@
+#! /usr/bin/python3
+import unittest
+
+import aco
+import graph
+
+
+class Place:
+    def __init__(self, interest=0, rest=False):
+        self.interest = interest
+        self.rest = rest
+
+
+class Road:
+    def __init__(self, cost_out, interest=0, rest=False):
+        self.cost_out = cost_out
+        self.interest = interest
+        self.rest = rest
+
+
+def build_grid(width=6, height=6):
+    """ A grid of two way roads, with a few interesting places and a cafe """
+    g = graph.Graph()
+    for x in range(width):
+        for y in range(height):
+            g.set_node((x, y), Place(interest=(x*y)%3, rest=(x, y) == (2, 2)))
+    for x in range(width):
+        for y in range(height):
+            for to in ((x+1, y), (x, y+1)):
+                if to in g:
+                    g.add_edge((x, y), to, Road(1+(x+y)%2, interest=x%2))
+                    g.add_edge(to, (x, y), Road(1+(x+y)%2, interest=x%2))
+    return g
+
+
+class TestPheromoneTrail(unittest.TestCase):
+    def test_setup_graph_gives_every_edge_a_level(self):
+        swarm = aco.Swarm(5, 20, 10, 1, 1, 0.75, aco.BasicAnt)
+        g = swarm.setup_graph(build_grid())
+        self.assertEqual(len(swarm.trail), len(g.get_edges()))
+        self.assertTrue(all(e.pheromones == 1 for _, _, e in g.get_edges()))
+
+    def test_edges_write_through_to_trail(self):
+        swarm = aco.Swarm(5, 20, 10, 1, 1, 0.75, aco.BasicAnt)
+        g = swarm.setup_graph(build_grid())
+        edge = g.get_edges((0, 0), (1, 0))[0]
+        edge.pheromones += 2
+        self.assertEqual(swarm.trail.levels[edge.eid], 3)
+        self.assertEqual(edge.cost_out, 1)
+
+
+class TestPopulation(unittest.TestCase):
+    def test_ants_are_reused_between_generations(self):
+        swarm = aco.Swarm(4, 20, 10, 1, 1, 0.75, aco.BasicAnt, 3)
+        g = swarm.setup_graph(build_grid())
+        first = list(swarm.run_generation(g, [(0, 0)]))
+        kept = [a.copy() for a in first]
+        routes = [list(a.moves) for a in first]
+        second = list(swarm.run_generation(g, [(5, 5)]))
+        self.assertEqual([id(a) for a in first], [id(a) for a in second])
+        self.assertEqual([list(a.moves) for a in kept], routes)
+        self.assertTrue(all(a.moves[0] == (5, 5) for a in second))
+
+    def test_best_is_a_route(self):
+        swarm = aco.Swarm(4, 20, 10, 1, 1, 0.75, aco.BasicAnt, 3)
+        swarm(build_grid(), [(0, 0)], 2)
+        self.assertIsInstance(swarm.best, aco.Route)
+        self.assertEqual(swarm.best.moves[0], (0, 0))
+
+    def test_ants_are_called(self):
+        class Counted(aco.BasicAnt):
+            __slots__ = ['calls']
+
+            def __call__(self, graph, choices=None):
+                self.calls = getattr(self, 'calls', 0)+1
+                super().__call__(graph, choices)
+        swarm = aco.Swarm(4, 20, 10, 1, 1, 0.75, Counted, 3)
+        ants = list(swarm.run_generation(swarm.setup_graph(build_grid()), [(0, 0)]))
+        self.assertEqual([a.calls for a in ants], [1]*4)
+        self.assertEqual(swarm.steps, sum(len(a.distances)-1 for a in ants))
+
+    def test_reset_clears_route(self):
+        ant = aco.BasicAnt((0, 0), 20, 10, 1, 1)
+        ant(aco.Swarm(4, 20, 10, 1, 1, 0.75, aco.BasicAnt).setup_graph(build_grid()))
+        ant.reset((1, 1))
+        self.assertEqual(ant.moves, [(1, 1)])
+        self.assertEqual(len(ant.edges), 0)
+        self.assertEqual((ant.age, ant.interest), (0, 0))
+
+
+class TestRouteChoices(unittest.TestCase):
+    def setUp(self):
+        self.graph = build_grid(2, 2)
+        self.choices = aco.RouteChoices(self.graph, lambda to, node, edge: 1+edge.interest)
+
+    def test_never_returns_to_last_node(self):
+        for roll in (0, 0.5, 0.99):
+            to, node, edge = self.choices.pick((0, 0), (1, 0), roll)
+            self.assertEqual(to, (0, 1))
+            self.assertIs(node, self.graph[(0, 1)])
+
+    def test_weights_are_cumulative(self):
+        choices, cumulative = self.choices.table((0, 0), None)
+        self.assertEqual([to for to, _, _ in choices], [(1, 0), (0, 1)])
+        self.assertEqual(cumulative, [1, 2])
+
+    def test_dead_end_raises_index_error(self):
+        self.graph.remove_edges((0, 0), (0, 1))
+        self.assertRaises(IndexError, self.choices.pick, (0, 0), (1, 0), 0.5)
+
+    def test_roll_picks_by_weight(self):
+        self.assertEqual(self.choices.pick((0, 0), None, 0.49)[0], (1, 0))
+        self.assertEqual(self.choices.pick((0, 0), None, 0.51)[0], (0, 1))
+
+
+class TestSimplifyJourney(unittest.TestCase):
+    def setUp(self):
+        self.ant = aco.BasicAnt(1, 10, 10, 1, 1)
+
+    def test_no_loops(self):
+        self.assertEqual(self.ant.simplify_journy([1, 2, 3]), [1, 2, 3])
+
+    def test_single_loop(self):
+        self.assertEqual(self.ant.simplify_journy([1, 2, 3, 2, 4]), [1, 2, 4])
+
+    def test_overlapping_loops(self):
+        self.assertEqual(self.ant.simplify_journy([1, 2, 3, 2, 5, 3, 6]), [1, 2, 5, 3, 6])
+
+    def test_repeated_visits(self):
+        self.assertEqual(self.ant.simplify_journy([1, 7, 1, 8, 1, 9]), [1, 9])
+
+    def test_return_to_start(self):
+        self.assertEqual(self.ant.simplify_journy([1, 2, 3, 1]), [1])
+
+
+class TestBasicAnt(unittest.TestCase):
+    def setUp(self):
+        swarm = aco.Swarm(5, 30, 30, 1, 1, 0.75, aco.BasicAnt)
+        self.graph = swarm.setup_graph(build_grid())
+        self.ant = aco.BasicAnt((0, 0), 30, 30, 1, 1)
+        self.ant(self.graph)
+
+    def test_records_edges_taken(self):
+        self.assertEqual(len(self.ant.edges), len(self.ant.moves)-1)
+        for (a, b), eid in zip(self.ant, self.ant.edges):
+            self.assertIn(eid, [e.eid for e in self.graph.get_edges(a, b)])
+
+    def test_totals_match_route(self):
+        edges = {e.eid: (a, e) for a, _, e in self.graph.get_edges()}
+        route = [edges[eid] for eid in self.ant.edges]
+        self.assertAlmostEqual(self.ant.age, sum(e.cost_out for _, e in route))
+        self.assertAlmostEqual(self.ant.interest, sum(e.interest+self.graph[a].interest for a, e in route))
+
+
+class TestPheromoneUpdates(unittest.TestCase):
+    def search(self, update):
+        swarm = aco.Swarm(8, 20, 10, 1, 1, 0.75, aco.BasicAnt, 3, update)
+        swarm(build_grid(), [(0, 0)], 6)
+        return swarm
+
+    def test_every_update_finds_a_route(self):
+        for Update in aco.UPDATES.values():
+            swarm = self.search(Update())
+            self.assertGreater(swarm.best.evaluate_route(), 0)
+
+    def test_best_of_generation_only_marks_best_route(self):
+        swarm = aco.Swarm(8, 20, 10, 1, 1, 1, aco.BasicAnt, 3, aco.BestOfGeneration())
+        g = swarm.setup_graph(build_grid())
+        ants = list(swarm.run_generation(g, [(0, 0)]))
+        swarm.track_best(ants)
+        swarm.deposit(g, ants)
+        marked = set(eid for eid, level in enumerate(swarm.trail.levels) if level > 1)
+        self.assertEqual(marked, set(swarm.best.edges))
+
+    def test_max_min_keeps_levels_in_bounds(self):
+        update = aco.MaxMin(ratio=0.1, restart=100)
+        swarm = self.search(update)
+        highest = swarm.best.evaluate_route()/(1-swarm.evaporation)
+        self.assertLessEqual(max(swarm.trail.levels), highest+1e-9)
+        self.assertGreaterEqual(min(swarm.trail.levels), 0.1*highest-1e-9)
+
+    def test_max_min_waits_for_a_route_of_interest(self):
+        dull = build_grid()
+        for nid in dull:
+            dull.get_node(nid).interest = 0
+        for _, _, e in dull.get_edges():
+            e.interest = 0
+        swarm = aco.Swarm(8, 20, 10, 1, 1, 0.75, aco.BasicAnt, 3, aco.MaxMin(restart=1))
+        swarm(dull, [(0, 0)], 5)
+        self.assertEqual(swarm.best.evaluate_route(), 0)
+        self.assertGreater(min(swarm.trail.levels), 0)
+
+    def test_max_min_needs_evaporation(self):
+        swarm = aco.Swarm(8, 20, 10, 1, 1, 1, aco.BasicAnt, 3, aco.MaxMin())
+        with self.assertRaises(ValueError):
+            swarm(build_grid(), [(0, 0)], 1)
+
+    def test_max_min_restarts(self):
+        update = aco.MaxMin(restart=0)
+        swarm = self.search(update)
+        self.assertEqual(update.restarted, swarm.generation)
+        self.assertEqual(len(set(swarm.trail.levels)), 1)
+
+
+class TestStoppingRules(unittest.TestCase):
+    def search(self, *rules):
+        swarm = aco.Swarm(5, 20, 10, 1, 1, 0.75, aco.BasicAnt, 3)
+        generations = []
+        swarm(build_grid(), [(0, 0)], 20, lambda g, i, ants: generations.append(i), stop=rules)
+        return swarm, generations
+
+    def test_runs_all_generations_without_rules(self):
+        swarm, generations = self.search()
+        self.assertEqual(len(generations), 20)
+        self.assertIsNone(swarm.stopped_by)
+
+    def test_stagnation(self):
+        rule = aco.Stagnation(2)
+        swarm, generations = self.search(rule)
+        self.assertEqual(rule.waited, 2)
+        self.assertEqual(swarm.stopped_by, str(rule))
+
+    def test_time_limit(self):
+        swarm, generations = self.search(aco.TimeLimit(0))
+        self.assertEqual(generations, [0])
+
+    def test_converged(self):
+        swarm, generations = self.search(aco.Converged(1.1))
+        self.assertEqual(generations, [0])
+
+    def test_trail_entropy(self):
+        self.assertAlmostEqual(aco.trail_entropy([2, 2, 2, 2]), 1)
+        self.assertAlmostEqual(aco.trail_entropy([0, 5, 0, 0]), 0)
+
+
+class TestParallelSwarm(unittest.TestCase):
+    def run_search(self, workers, seed):
+        swarm = aco.ParallelSwarm(12, 20, 10, 1, 1, 0.75, aco.BasicAnt, seed, workers=workers)
+        result = swarm(build_grid(), [(0, 0), (5, 5)], 3)
+        return [e.pheromones for _, _, e in result.get_edges()]
+
+    def test_same_result_as_serial_swarm(self):
+        swarm = aco.Swarm(12, 20, 10, 1, 1, 0.75, aco.BasicAnt, 7)
+        result = swarm(build_grid(), [(0, 0), (5, 5)], 3)
+        self.assertEqual([e.pheromones for _, _, e in result.get_edges()], self.run_search(3, 7))
+
+    def test_same_seed_same_result(self):
+        self.assertEqual(self.run_search(2, 7), self.run_search(2, 7))
+
+    def test_different_seed_different_result(self):
+        self.assertNotEqual(self.run_search(2, 7), self.run_search(2, 8))
+
+    def test_ants_are_shared_between_workers(self):
+        swarm = aco.ParallelSwarm(7, 20, 10, 1, 1, 0.75, aco.BasicAnt, 1, workers=3)
+        self.assertEqual(swarm.shares(), [3, 2, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+#! /usr/bin/python3
+import csv
+import os
+import tempfile
+import unittest
+
+import aco
+import analysis
+from test_aco import build_grid
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TestSpread(unittest.TestCase):
+    def test_one_pass(self):
+        self.assertEqual(analysis.spread(iter([3, 1, 4, 1, 5])), aco.Stats(1, 2.8, 5, 5))
+
+    def test_nothing(self):
+        self.assertEqual(analysis.spread([]), aco.Stats(0, 0, 0, 0))
+
+
+class TestGenerationSummary(unittest.TestCase):
+    def run_generation(self):
+        swarm = aco.Swarm(5, 20, 10, 1, 1, 0.75, aco.BasicAnt, 2)
+        graph = swarm.setup_graph(build_grid())
+        swarm.trail.levels[3] = 7
+        return graph, list(swarm.run_generation(graph, [(0, 0)]))
+
+    def test_shared_by_a_generation(self):
+        summaries = []
+
+        class Seen(analysis.StepsTaken):
+            def __call__(self, graph, gen, ants, summary=None):
+                summaries.append(summary)
+                return super().__call__(graph, gen, ants, summary)
+        wrapped = analysis.Scheduled(Seen(None))
+        swarm = aco.Swarm(5, 20, 10, 1, 1, 0.75, aco.BasicAnt, 2)
+        swarm(build_grid(), [(0, 0)], 2, Seen(None), wrapped, lambda graph, gen, ants: None)
+        self.assertEqual(len(summaries), 4)
+        self.assertIs(summaries[0], summaries[1])
+        self.assertIsNot(summaries[1], summaries[2])
+        self.assertEqual([s.gen for s in summaries], [0, 0, 1, 1])
+
+    def test_sampled_ants_are_summarised_apart(self):
+        graph, ants = self.run_generation()
+        summary = analysis.GenerationSummary(graph, 0, [])
+        scheduled = analysis.Scheduled(analysis.StepsTaken(None), sample=0.5)
+        self.assertFalse(scheduled.summarised)
+        self.assertEqual(scheduled(graph, 0, ants, summary)[2], max(len(a.moves) for a in ants[::2]))
+
+    def test_statistics(self):
+        graph, ants = self.run_generation()
+        summary = analysis.GenerationSummary(graph, 0, ants)
+        self.assertEqual(summary.steps.max, max(len(a.moves) for a in ants))
+        self.assertEqual(summary.interest.mean, sum(a.interest for a in ants)/len(ants))
+        levels = [e.pheromones for _, _, e in graph.get_edges()]
+        self.assertEqual(summary.pheromones, aco.Stats(1, sum(levels)/len(levels), 7, len(levels)))
+
+    def test_analysers_report_the_summary(self):
+        graph, ants = self.run_generation()
+        distances = [a.age for a in ants]
+        row = analysis.Distance(graph)(graph, 0, ants)
+        self.assertEqual(row, [min(distances), sum(distances)/len(distances), max(distances)])
+
+
+class TestScheduled(unittest.TestCase):
+    def test_every_few_generations_and_the_last(self):
+        scheduled = analysis.Scheduled(analysis.StepsTaken(None), 3, last=7)
+        self.assertEqual([g for g in range(8) if scheduled.due(g)], [0, 3, 6, 7])
+
+    def test_first_and_last_only(self):
+        scheduled = analysis.Scheduled(analysis.StepsTaken(None), None, last=7)
+        self.assertEqual([g for g in range(8) if scheduled.due(g)], [0, 7])
+
+    def test_samples_ants(self):
+        seen = []
+        scheduled = analysis.Scheduled(lambda graph, gen, ants: seen.extend(ants), sample=0.25)
+        scheduled(None, 0, list(range(8)))
+        self.assertEqual(seen, [0, 4])
+
+    def test_csv_fills_skipped_generations(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'analysis.csv')
+            steps = analysis.Scheduled(analysis.StepsTaken(None), 2)
+            wrapper = analysis.CSVWrapper(filename, [steps])
+            ants = TestGenerationSummary().run_generation()[1]
+            for gen in range(3):
+                wrapper(None, gen, ants)
+            wrapper.close()
+            with open(filename) as source:
+                rows = list(csv.reader(source))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[2], ['', '', ''])
+        self.assertEqual(len(rows[3]), 3)
+
+    def test_final_generation_analysed_when_closed(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'analysis.csv')
+            steps = analysis.Scheduled(analysis.StepsTaken(None), None, last=9)
+            swarm = aco.Swarm(4, 20, 10, 1, 1, 0.75, aco.BasicAnt, 3)
+            swarm(build_grid(), [(0, 0)], 10, analysis.CSVWrapper(filename, [steps]), stop=[lambda s, gen, ants: gen == 3])
+            with open(filename) as source:
+                rows = list(csv.reader(source))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[2], ['', '', ''])
+        self.assertNotIn('', rows[4])
+        self.assertEqual(steps.final[0], 3)
+
+    def test_sample_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            analysis.Scheduled(analysis.StepsTaken(None), sample=0)
+
+
+class Walker:
+    """ An ant that has already taken its route """
+    def __init__(self, moves, score):
+        self.moves, self.edges, self.score = moves, list(range(len(moves)-1)), score
+        self.age = self.interest = score
+
+    def evaluate_route(self):
+        return self.score
+
+
+class TestPreserveBest(unittest.TestCase):
+    def test_keeps_the_best_distinct_routes(self):
+        spot_best = analysis.PreserveBest(None, 2, 3)
+        spot_best(None, 0, [Walker([1, 2], 5), Walker([1, 3], 1), Walker([1, 2], 5), Walker([1, 4], 4)])
+        spot_best(None, 1, [Walker([1, 5], 2), Walker([1, 4], 4), Walker([1, 6], 7)])
+        self.assertEqual([r.moves for r in spot_best.best], [(1, 4), (1, 2), (1, 6)])
+        self.assertEqual([[r.score for r in gen] for gen in spot_best.best_by_gen], [[4, 5], [4, 7]])
+
+    def test_duplicates_do_not_crowd_out_routes(self):
+        spot_best = analysis.PreserveBest(None, 2, 2)
+        spot_best(None, 0, [Walker([1, 2], 5), Walker([1, 2], 5), Walker([1, 3], 4), Walker([1, 4], 1)])
+        self.assertEqual([r.moves for r in spot_best.best_by_gen[0]], [(1, 3), (1, 2)])
+        self.assertEqual(spot_best.kept_moves, {(1, 2), (1, 3)})
+        spot_best(None, 1, [Walker([1, 5], 6)])
+        self.assertEqual(spot_best.kept_moves, {(1, 2), (1, 5)})
+
+    def test_history_is_bounded(self):
+        spot_best = analysis.PreserveBest(None, 1, 1, history=2)
+        for gen in range(5):
+            spot_best(None, gen, [Walker([1, gen+2], gen)])
+        self.assertEqual([[r.score for r in gen] for gen in spot_best.best_by_gen], [[3], [4]])
+
+    def test_snapshots_do_not_change_with_the_ant(self):
+        spot_best = analysis.PreserveBest(None, 1, 1)
+        ant = Walker([1, 2], 5)
+        spot_best(None, 0, [ant])
+        ant.moves.append(3)
+        self.assertEqual(spot_best.best[-1].moves, (1, 2))
+        self.assertIs(spot_best.best[-1].copy(), spot_best.best[-1])
+
+
+class TestInstrumentation(unittest.TestCase):
+    def test_reports_every_phase(self):
+        swarm = aco.Swarm(5, 20, 10, 1, 1, 0.75, aco.BasicAnt, 2)
+        instrumentation = analysis.Instrumentation(swarm)
+        rows = []
+        swarm(build_grid(), [(0, 0)], 3, lambda graph, gen, ants: rows.append(instrumentation(graph, gen, ants)))
+        self.assertEqual(len(rows[0]), len(instrumentation.row_headers()))
+        self.assertTrue(all(r[0] > 0 and r[-1] > 0 for r in rows))
+        self.assertEqual(rows[0][4], 0)
+        self.assertEqual(instrumentation.ants, 15)
+        self.assertEqual(set(instrumentation.result()), set(aco.PHASES))
+
+
+class TestSinks(unittest.TestCase):
+    def test_swarm_closes_csv(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'analysis.csv')
+            wrapper = analysis.CSVWrapper(filename, [analysis.StepsTaken(None)])
+            aco.Swarm(5, 20, 10, 1, 1, 0.75, aco.BasicAnt, 2)(build_grid(), [(0, 0)], 3, wrapper)
+            self.assertTrue(wrapper.sink.file.closed)
+            with open(filename) as source:
+                self.assertEqual(len(list(csv.reader(source))), 4)
+
+    @unittest.skipIf(numpy is None, "needs NumPy")
+    def test_npz_columns(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'analysis.npz')
+            sink = analysis.open_sink(filename)
+            sink.writerow(['a', 'b'])
+            sink.writerow([1, ''])
+            sink.writerow([2, 3])
+            sink.close()
+            columns = numpy.load(filename)
+            self.assertEqual(list(columns['a']), [1, 2])
+            self.assertTrue(numpy.isnan(columns['b'][0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
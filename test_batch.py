@@ -0,0 +1,46 @@
+#! /usr/bin/python3
+import unittest
+
+import aco
+import batch
+from test_aco import build_grid
+
+
+class TestSearch(unittest.TestCase):
+    def test_matches_a_single_swarm(self):
+        request = batch.RouteRequest((0, 0), max_distance=20, size=5, rest=10, generations=3, seed=4)
+        graph, trail = batch.prepare(build_grid())
+        result = batch.search(graph, trail, request)
+        swarm = aco.Swarm(5, 20, 10, 1, 1, 0.75, aco.BasicAnt, 4)
+        levels = swarm(build_grid(), [(0, 0)], 3).get_edges()
+        self.assertEqual(list(trail.levels), [e.pheromones for _, _, e in levels])
+        self.assertEqual(result.route[0], (0, 0))
+        self.assertEqual(result.generations, 3)
+        self.assertEqual(result.seed, 4)
+
+    def test_requests_start_from_a_fresh_trail(self):
+        first = batch.RouteRequest((0, 0), max_distance=20, size=5, rest=10, generations=3, seed=4)
+        second = first._replace(start=(5, 5), seed=9)
+        graph, trail = batch.prepare(build_grid())
+        batch.search(graph, trail, first)
+        after_first = batch.search(graph, trail, second)
+        graph, trail = batch.prepare(build_grid())
+        alone = batch.search(graph, trail, second)
+        self.assertEqual(after_first[:5], alone[:5])
+
+
+class TestBatchSearch(unittest.TestCase):
+    def test_results_in_request_order(self):
+        requests = [batch.RouteRequest(start, max_distance=20, size=5, rest=10, generations=2, seed=1)
+                    for start in ((0, 0), (5, 5), (2, 3))]
+        searcher = batch.BatchSearch(build_grid(), 2)
+        try:
+            results = searcher(requests)
+        finally:
+            searcher.close()
+        self.assertEqual([r.request for r in results], requests)
+        self.assertEqual([r.route[0] for r in results], [(0, 0), (5, 5), (2, 3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
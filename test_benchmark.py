@@ -0,0 +1,31 @@
+#! /usr/bin/python3
+from random import Random
+import unittest
+
+import benchmark
+
+
+class TestSyntheticGraphs(unittest.TestCase):
+    def test_grid(self):
+        g = benchmark.grid_graph(4, Random(1))
+        self.assertEqual(len(g), 16)
+        self.assertEqual(len(g.get_edges()), 2*2*4*3)
+
+    def test_geometric_is_repeatable_and_two_way(self):
+        g = benchmark.geometric_graph(200, Random(1))
+        self.assertEqual(len(g.get_edges()), len(benchmark.geometric_graph(200, Random(1)).get_edges()))
+        for f, t, _ in g.get_edges():
+            self.assertTrue(g.get_edges(t, f))
+
+
+class TestMeasure(unittest.TestCase):
+    def test_fastest_time_and_peak(self):
+        made = []
+        seconds, peak = benchmark.measure(lambda: made.append(1), lambda _: [0]*100000, 3)
+        self.assertEqual(len(made), 4)
+        self.assertGreater(seconds, 0)
+        self.assertGreaterEqual(peak, 800000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+#! /usr/bin/python3
+import os
+import tempfile
+import unittest
+
+import batch
+import cache
+from test_aco import build_grid
+
+
+def result(request, score=1):
+    return batch.RouteResult(request, [request.start], score, 0, 0, 1, 0.1, 0.1, None, request.seed)
+
+
+class TestResultCache(unittest.TestCase):
+    def test_normalises_requests(self):
+        results = cache.ResultCache(build_grid())
+        results.put(result(batch.RouteRequest((0, 0), 20, seed=1)))
+        found = results.get(batch.RouteRequest((0, 0), 20.0, alpha=1.0, seed=1))
+        self.assertEqual(found.score, 1)
+        self.assertEqual(found.request.max_distance, 20.0)
+        self.assertIsNone(results.get(batch.RouteRequest((0, 0), 21, seed=1)))
+        self.assertEqual((results.hits, results.misses), (1, 1))
+
+    def test_seeds_are_not_normalised(self):
+        results = cache.ResultCache(build_grid())
+        keys = [results.key(batch.RouteRequest((0, 0), seed=s)) for s in (1, 1.0, 2**60, 2**60+1)]
+        self.assertEqual(len(set(keys)), 4)
+
+    def test_unseeded_requests_are_not_kept(self):
+        results = cache.ResultCache(build_grid())
+        results.put(result(batch.RouteRequest((0, 0))))
+        self.assertIsNone(results.get(batch.RouteRequest((0, 0))))
+
+    def test_only_repeatable_results_are_kept(self):
+        results = cache.ResultCache(build_grid())
+        timed = batch.RouteRequest((0, 0), size=5, rest=10, generations=50, seed=1, time=1e-9)
+        stalled = timed._replace(time=None, patience=1)
+        graph, trail = batch.prepare(build_grid())
+        for request in (timed, stalled):
+            results.put(batch.search(graph, trail, request))
+        self.assertIsNone(results.get(timed))
+        self.assertIsNotNone(results.get(stalled))
+        self.assertTrue(results.get(stalled).stopped_by)
+
+    def test_least_recently_used_are_dropped(self):
+        results = cache.ResultCache(build_grid(), capacity=2)
+        first, second, third = (batch.RouteRequest((0, 0), seed=s) for s in range(3))
+        results.put(result(first))
+        results.put(result(second))
+        results.get(first)
+        results.put(result(third))
+        self.assertIsNotNone(results.get(first))
+        self.assertIsNone(results.get(second))
+
+    def test_searches_once(self):
+        searched = []
+        results = cache.ResultCache(build_grid())
+        request = batch.RouteRequest((0, 0), seed=1)
+        for _ in range(3):
+            results(request, lambda r: searched.append(r) or result(r))
+        self.assertEqual(searched, [request])
+
+    def test_saved_until_the_graph_changes(self):
+        request = batch.RouteRequest((0, 0), seed=1)
+        with tempfile.TemporaryDirectory() as folder:
+            cache.ResultCache(build_grid(), folder=folder).put(result(request, 5))
+            self.assertEqual(cache.ResultCache(build_grid(), folder=folder).get(request).score, 5)
+            changed = build_grid()
+            changed.get_edges((0, 0), (0, 1))[0].cost_out = 2
+            self.assertIsNone(cache.ResultCache(changed, folder=folder).get(request))
+            self.assertEqual(os.listdir(folder), [])
+
+    def test_disk_limit(self):
+        with tempfile.TemporaryDirectory() as folder:
+            results = cache.ResultCache(build_grid(), folder=folder, disk_limit=0)
+            results.put(result(batch.RouteRequest((0, 0), seed=1)))
+            self.assertEqual(os.listdir(folder), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
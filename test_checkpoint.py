@@ -0,0 +1,55 @@
+#! /usr/bin/python3
+import os
+import tempfile
+import unittest
+
+import aco
+import analysis
+from checkpoint import Checkpoint, Checkpointer
+from test_aco import build_grid
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        handle, self.filename = tempfile.mkstemp()
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def swarm(self):
+        return aco.Swarm(6, 20, 10, 1, 1, 0.75, aco.BasicAnt, 5, aco.MaxMin(restart=2))
+
+    def test_resumed_search_matches_uninterrupted(self):
+        whole = self.swarm()
+        expected = whole(build_grid(), [(0, 0)], 6)
+        first = self.swarm()
+        first(build_grid(), [(0, 0)], 4, Checkpointer(first, self.filename, 2))
+        spot_best = analysis.PreserveBest(None)
+        checkpoint = Checkpoint.load(self.filename)
+        second = aco.Swarm(6, 20, 10, 1, 1, 0.75, aco.BasicAnt, None, aco.MaxMin(restart=2))
+        result = second(build_grid(), [(0, 0)], 6, spot_best,
+                        resume=lambda swarm, graph: checkpoint.restore(swarm, graph, spot_best))
+        self.assertEqual(second.seed, 5)
+        self.assertEqual(len(spot_best.best_by_gen), 2)
+        self.assertEqual(list(second.trail.levels), list(whole.trail.levels))
+        self.assertEqual(second.best.moves, whole.best.moves)
+
+    def test_keeps_analyser_state(self):
+        swarm = self.swarm()
+        spot_best = analysis.PreserveBest(None)
+        swarm(build_grid(), [(0, 0)], 2, spot_best, Checkpointer(swarm, self.filename, 1, spot_best))
+        restored, again = analysis.PreserveBest(None), self.swarm()
+        Checkpoint.load(self.filename).restore(again, again.setup_graph(build_grid()), restored)
+        self.assertEqual([a.moves for a in restored.best], [a.moves for a in spot_best.best])
+
+    def test_warm_start_checks_graph(self):
+        swarm = self.swarm()
+        swarm(build_grid(), [(0, 0)], 2, Checkpointer(swarm, self.filename, 1))
+        other = self.swarm()
+        self.assertRaises(ValueError, other, build_grid(3, 3), [(0, 0)], 2,
+                          resume=Checkpoint.load(self.filename).warm_start)
+
+
+if __name__ == '__main__':
+    unittest.main()
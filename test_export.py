@@ -0,0 +1,82 @@
+#! /usr/bin/python3
+import io
+import json
+import unittest
+import xml.etree.ElementTree as ET
+
+import export
+import graph
+import osm
+
+
+class Stop:
+    def __init__(self, lat, lon):
+        self.position = lat, lon
+
+
+class Road:
+    def __init__(self, nid, eid=None):
+        self.nid = nid
+        self.eid = eid
+        self.pheromones = 1
+
+
+def build_road():
+    """ Two stops joined by two roads, one bending through node 10 and one through nodes 20 and 21 """
+    g = graph.Graph()
+    g.set_node(1, Stop(0, 0))
+    g.set_node(2, Stop(1, 1))
+    g.add_edge(1, 2, Road([10], 0))
+    g.add_edge(1, 2, Road([20, 21, 99], 1))
+    g.coordinates = osm.CoordinateStore([(21, 0.5, 0.6), (10, 0, 1), (20, 0.5, 0.4)])
+    return g
+
+
+class TestCoordinateStore(unittest.TestCase):
+    def test_lookup(self):
+        store = osm.CoordinateStore([(5, 1.5, 2.5), (3, 0.5, 0.25)])
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store[5], (1.5, 2.5))
+        self.assertIn(3, store)
+        self.assertNotIn(4, store)
+        with self.assertRaises(KeyError):
+            store[4]
+
+
+class TestRoutePoints(unittest.TestCase):
+    def test_follows_the_road(self):
+        g = build_road()
+        self.assertEqual(list(export.route_points(g, [1, 2])), [(0, 0), (0, 1), (1, 1)])
+
+    def test_picks_the_edge_taken(self):
+        g = build_road()
+        self.assertEqual(list(export.route_points(g, [1, 2], [1])), [(0, 0), (0.5, 0.4), (0.5, 0.6), (1, 1)])
+
+    def test_without_coordinates(self):
+        g = build_road()
+        g.coordinates = None
+        self.assertEqual(list(export.route_points(g, [1, 2], [1])), [(0, 0), (1, 1)])
+
+
+class TestWriters(unittest.TestCase):
+    def test_gpx(self):
+        sink = io.StringIO()
+        export.write_gpx(sink, [("a & b", iter([(0, 0), (0.5, 1)]))])
+        ns = {'gpx': 'http://www.topografix.com/GPX/1/1'}
+        root = ET.fromstring(sink.getvalue())
+        self.assertEqual(root.find('gpx:trk/gpx:name', ns).text, "a & b")
+        points = root.findall('gpx:trk/gpx:trkseg/gpx:trkpt', ns)
+        self.assertEqual([(float(p.get('lat')), float(p.get('lon'))) for p in points], [(0, 0), (0.5, 1)])
+
+    def test_geojson(self):
+        sink = io.StringIO()
+        export.write_geojson(sink, [({'score': 1}, iter([(0, 0), (0.5, 1)])), ({}, [])])
+        collection = json.loads(sink.getvalue())
+        self.assertEqual(len(collection['features']), 2)
+        feature = collection['features'][0]
+        self.assertEqual(feature['properties'], {'score': 1})
+        self.assertEqual(feature['geometry']['coordinates'], [[0, 0], [1, 0.5]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+#! /usr/bin/python3
+from array import array
+import unittest
+
+import aco
+import analysis
+import islands
+from test_aco import build_grid
+
+
+def build_swarm(seed=4):
+    return aco.Swarm(5, 20, 10, 1, 1, 0.75, aco.BasicAnt, seed)
+
+
+class TestIslands(unittest.TestCase):
+    def test_one_colony_matches_a_single_swarm(self):
+        colonies = islands.Islands(build_swarm(), 1, every=3, workers=1)
+        graph = colonies(build_grid(), [(0, 0)], 3)
+        alone = build_swarm(colonies.seeds()[0])
+        levels = alone(build_grid(), [(0, 0)], 3).get_edges()
+        self.assertEqual([e.pheromones for _, _, e in graph.get_edges()], [e.pheromones for _, _, e in levels])
+        self.assertEqual(colonies.best.evaluate_route(), alone.best.evaluate_route())
+
+    def test_reports_the_best_of_all_colonies(self):
+        spot_best = analysis.PreserveBest(None, 1, 1)
+        colonies = islands.Islands(build_swarm(), 3, every=2, workers=2)
+        colonies(build_grid(), [(0, 0)], 5, spot_best)
+        self.assertEqual(colonies.generation, 5)
+        self.assertEqual(len(spot_best.best_by_gen), 5)
+        self.assertEqual(spot_best.best[-1].evaluate_route(), colonies.best.evaluate_route())
+
+    def test_repeatable(self):
+        runs = []
+        for _ in range(2):
+            colonies = islands.Islands(build_swarm(), 2, every=2, migration='blend', workers=2)
+            graph = colonies(build_grid(), [(0, 0)], 4)
+            runs.append([e.pheromones for _, _, e in graph.get_edges()])
+        self.assertEqual(runs[0], runs[1])
+
+    def test_blend_moves_trails_towards_the_mean(self):
+        colonies = islands.Islands(build_swarm(), 2, migration='blend', blend=0.5)
+        states = [{'levels': array('d', [1, 3]), 'best': None}, {'levels': array('d', [3, 5]), 'best': None}]
+        colonies.migrate(states)
+        self.assertEqual(list(colonies.trail.levels), [2, 4])
+        self.assertEqual(list(states[0]['levels']), [1.5, 3.5])
+        self.assertEqual(list(states[1]['levels']), [2.5, 4.5])
+
+    def test_unknown_migration(self):
+        with self.assertRaises(ValueError):
+            islands.Islands(build_swarm(), 2, migration='swap')
+
+
+if __name__ == '__main__':
+    unittest.main()
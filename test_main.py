@@ -0,0 +1,54 @@
+#! /usr/bin/python3
+import io
+from contextlib import redirect_stdout
+import unittest
+
+import main
+from test_aco import build_grid
+
+try:
+    from docopt import docopt
+except ImportError:
+    docopt = None
+
+
+@unittest.skipIf(docopt is None, "needs docopt")
+class TestCheckConfig(unittest.TestCase):
+    def config(self, *argv):
+        return docopt(main.__doc__, ['pickle', 'graph.pickle']+list(argv))
+
+    def test_plain_search(self):
+        self.assertIsNone(main.check_config(self.config('--instrument')))
+        self.assertIsNone(main.check_config(self.config('--islands', '2')))
+
+    def test_islands_can_not_be_instrumented(self):
+        config = self.config('--islands', '2', '--instrument', '-g', '1')
+        self.assertIn('--instrument', main.check_config(config))
+        output = io.StringIO()
+        with redirect_stdout(output):
+            main.graph_to_gpx(build_grid(), config)
+        self.assertEqual(output.getvalue(), "--instrument can not be used with islands\n")
+
+    def test_sample_must_be_positive(self):
+        self.assertIsNotNone(main.check_config(self.config('--sample', '0')))
+
+    def test_max_min_needs_evaporation(self):
+        self.assertIsNotNone(main.check_config(self.config('-u', 'maxmin', '-e', '1')))
+        self.assertIsNone(main.check_config(self.config('-u', 'maxmin', '-e', '0.9')))
+
+    def test_analysis_at_the_ends(self):
+        config = self.config('--analysis-every', 'ends', '-g', '5')
+        self.assertIsNone(main.check_config(config))
+        with redirect_stdout(io.StringIO()):
+            analysers = main.set_up_analyisis(build_grid(), config)
+        scheduled = [a for a in analysers if isinstance(a, main.analysis.Scheduled)]
+        self.assertTrue(scheduled)
+        self.assertEqual([g for g in range(5) if scheduled[0].due(g)], [0, 4])
+
+    def test_islands_can_not_checkpoint(self):
+        self.assertIsNotNone(main.check_config(self.config('--islands', '2', '--checkpoint', 'x')))
+        self.assertIsNotNone(main.check_config(self.config('--islands', '2', '--resume', 'x')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,13 @@
 #! /usr/bin/python3
+import os
+import pickle
+import tempfile
 import unittest
 import xml.sax as sax
 
 import graph
 import osm
+import tagrules
 
 
 @unittest.skip("long test")
@@ -153,8 +157,104 @@ class TestWayToGraph(unittest.TestCase):
     pass
 
 
+def grid_extract(columns, width=4, height=6, cut=False):
+    """ OSM XML of a grid of roads, one along each column and each row, cut
+        to the roads of the given columns and, as OSM extracts do, the
+        whole of every road crossing them, or only their part along the
+        columns if cut
+    """
+    lines = ['<osm>']
+    for x in range(height):
+        for y in range(width):
+            if x in columns or (not cut and (y == 0 or y == width-1)):
+                lines.append('<node id="{}" lat="{}" lon="{}"/>'.format(x*width+y+1, 50+y*0.01, x*0.01))
+    for x in columns:
+        lines.append('<way id="{}">'.format(1000+x))
+        lines.extend('<nd ref="{}"/>'.format(x*width+y+1) for y in range(width))
+        lines.append('<tag k="highway" v="tertiary"/></way>')
+    for y in (0, width-1):
+        lines.append('<way id="{}">'.format(2000+y))
+        lines.extend('<nd ref="{}"/>'.format(x*width+y+1) for x in range(height) if x in columns or not cut)
+        lines.append('<tag k="highway" v="unclassified"/></way>')
+    return '\n'.join(lines+['</osm>'])
+
+
+def close_node(extract, nid):
+    """ extract with the node nid tagged access=no """
+    node = '<node id="{}" '.format(nid)
+    if node not in extract:
+        return extract
+    start = extract.index(node)
+    end = extract.index('/>', start)
+    return extract[:end]+'><tag k="access" v="no"/></node>'+extract[end+2:]
+
+
 class TestOSMHandler(unittest.TestCase):
-    pass
+    def test_extracts_are_parsed_without_a_store(self):
+        handler = osm.ExtractHandler()
+        self.assertIsNone(handler.db)
+        sax.parseString(grid_extract(range(2)).encode('utf-8'), handler)
+        self.assertEqual(len(handler.nodes), 16)
+
+    def test_stitch_keeps_shared_parts_once(self):
+        shared = {'id': 7, 'nodes': [1, 2, 3]}
+        handler = osm.OSMHandler()
+        handler.stitch([([(1, 50, 0, 0, 0), (2, 50, 0.01, 0, 0)], [{'id': 7, 'nodes': [1, 2]}]),
+                        ([(2, 50, 0.01, 0, 0), (3, 50, 0.02, 0, 0)], [shared])])
+        self.assertEqual(handler.ways, [shared])
+        self.assertEqual(handler.db.get_node(2).lon, 0.01)
+        self.assertEqual(sorted(handler.db.load_intersections()), [])
+
+    def test_stitched_extracts_match_the_whole(self):
+        for cut in (False, True):
+            with self.subTest(cut=cut):
+                self.stitched_extracts_match_the_whole(cut)
+
+    def test_join_copies(self):
+        self.assertEqual(osm.join_copies([[1, 2, 3], [3, 4, 5], [2, 3]]), [[1, 2, 3, 4, 5]])
+        self.assertEqual(osm.join_copies([[4, 5], [1, 2]]), [[4, 5], [1, 2]])
+        self.assertEqual(osm.join_copies([[5, 6], [1, 2, 3], [3, 4, 5]]), [[1, 2, 3, 4, 5, 6]])
+
+    def stitched_extracts_match_the_whole(self, cut):
+        with tempfile.TemporaryDirectory() as folder:
+            files = {}
+            for name, columns in (('whole', range(6)), ('west', range(4)), ('east', range(3, 6))):
+                files[name] = os.path.join(folder, name+'.osm')
+                with open(files[name], 'w') as sink:
+                    sink.write(grid_extract(columns, cut=cut))
+            whole = osm.load_graph(files['whole'], 0.002)
+            stitched = osm.parse_extracts([files['west'], files['east']], 0.002, workers=2)
+        self.assertIn('stitch', stitched.timings)
+        self.assertEqual(sorted(stitched.graph), sorted(whole))
+        self.assertEqual(sorted((f, t, e.nid) for f, t, e in stitched.graph.get_edges()),
+                         sorted((f, t, e.nid) for f, t, e in whole.get_edges()))
+
+    def test_ways_are_split_at_closed_nodes(self):
+        rules = tagrules.TagRules({'route': {'highway': tagrules.ANY}, 'closed': {'access': ('no',)}})
+        with tempfile.TemporaryDirectory() as folder:
+            files = {}
+            for name, columns in (('whole', range(6)), ('west', range(4)), ('east', range(3, 6))):
+                files[name] = os.path.join(folder, name+'.osm')
+                with open(files[name], 'w') as sink:
+                    sink.write(close_node(grid_extract(columns), 6))
+            graphs = [osm.load_graph(files['whole'], 0.002, rules=rules),
+                      osm.load_graph([files['west'], files['east']], 0.002, workers=2, rules=rules)]
+        for g in graphs:
+            self.assertTrue(g.get_edges())
+            self.assertFalse([e for _, _, e in g.get_edges() if 6 in e.nid])
+            self.assertNotIn(6, g)
+            self.assertFalse([e for a, b, e in g.get_edges() if {a, b} == {5, 8}])
+
+    def test_loads_pickled_graphs(self):
+        with tempfile.TemporaryDirectory() as folder:
+            extract, pickled = os.path.join(folder, 'grid.osm.xml'), os.path.join(folder, 'grid.osm')
+            with open(extract, 'w') as sink:
+                sink.write(grid_extract(range(4)))
+            loaded = osm.load_graph(extract, 0.002)
+            with open(pickled, 'wb') as sink:
+                pickle.dump(loaded, sink)
+            self.assertEqual(sorted(osm.load_graph_file(pickled, 0.002)), sorted(loaded))
+            self.assertEqual(sorted(osm.load_graph_file(extract, 0.002)), sorted(loaded))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,49 @@
+#! /usr/bin/python3
+import os
+import pstats
+import tempfile
+import unittest
+
+import aco
+import profiling
+from test_aco import build_grid
+
+
+def busy(n):
+    return sum(range(n))
+
+
+class TestPhaseProfiler(unittest.TestCase):
+    def test_inner_phases_are_not_counted_in_outer(self):
+        profiler = profiling.PhaseProfiler(None)
+        inner = profiler.wrap('inner', busy)
+        profiler.wrap('outer', lambda: inner(10))()
+        functions = lambda name: {f for _, _, f in pstats.Stats(profiler.profiles[name]).stats}
+        self.assertIn('busy', functions('inner'))
+        self.assertNotIn('busy', functions('outer'))
+        self.assertEqual(profiler.running, [])
+
+    def test_generators_run_within_the_phase(self):
+        profiler = profiling.PhaseProfiler(None)
+        self.assertEqual(profiler.wrap('count', lambda: (i for i in range(3)))(), [0, 1, 2])
+
+    def test_profiles_a_search(self):
+        profiler = profiling.PhaseProfiler(0.001)
+        swarm = aco.Swarm(5, 20, 10, 1, 1, 0.75, aco.BasicAnt, 1)
+        seen = []
+        analytics = profiling.profile_swarm(profiler, swarm, [lambda graph, gen, ants: seen.append(gen)])
+        profiler.start()
+        try:
+            swarm(build_grid(), [(0, 0)], 3, *analytics)
+        finally:
+            profiler.stop()
+        self.assertEqual(seen, [0, 1, 2])
+        self.assertEqual(set(profiler.profiles), {'setup_graph', 'travel', 'deposit', 'evaporate', 'analysis'})
+        with tempfile.TemporaryDirectory() as folder:
+            profiler.save(folder)
+            self.assertIn('travel.pstats', os.listdir(folder))
+        self.assertIn('travel', profiler.summary(3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+#! /usr/bin/python3
+from http.client import HTTPConnection
+import json
+import threading
+import unittest
+
+import batch
+import service
+from test_aco import build_grid
+
+
+class TestRouteService(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.service = service.RouteService({'grid': build_grid()}, workers=1, queue=0, timeout=30, cache=10)
+        cls.server = service.RouteServer(('127.0.0.1', 0), cls.service)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.service.close()
+
+    def call(self, method, path, body=None):
+        connection = HTTPConnection(*self.server.server_address, timeout=30)
+        try:
+            connection.request(method, path, json.dumps(body) if body is not None else None)
+            response = connection.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            connection.close()
+
+    def test_lists_graphs(self):
+        self.assertEqual(self.call('GET', '/graphs'), (200, {'graphs': {'grid': {'nodes': 36}}}))
+
+    def test_route(self):
+        request = {'start': [0, 0], 'max_distance': 20, 'size': 5, 'rest': 10, 'generations': 2, 'seed': 4}
+        status, result = self.call('POST', '/route/grid', request)
+        self.assertEqual(status, 200)
+        graph, trail = batch.prepare(build_grid())
+        expected = batch.search(graph, trail, batch.RouteRequest((0, 0), 20, size=5, rest=10, generations=2, seed=4))
+        self.assertEqual([tuple(n) for n in result['route']], expected.route)
+        self.assertEqual(result['score'], expected.score)
+        self.assertEqual(result['request']['time'], None)
+        hits = self.service.caches['grid'].hits
+        self.assertEqual(self.call('POST', '/route/grid', request), (200, result))
+        self.assertEqual(self.service.caches['grid'].hits, hits+1)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.call('POST', '/route/nowhere', {'start': [0, 0]})[0], 404)
+        self.assertEqual(self.call('POST', '/route/grid', {'start': [0, 0], 'speed': 1})[0], 400)
+        self.assertEqual(self.call('POST', '/route/grid', {'max_distance': 1})[0], 400)
+
+    def test_turns_away_requests_when_busy(self):
+        slots = self.service.slots['grid']
+        slots.acquire()
+        try:
+            with self.assertRaises(service.Busy):
+                self.service.route('grid', batch.RouteRequest((0, 0)))
+            self.assertEqual(self.call('POST', '/route/grid', {'start': [0, 0]})[0], 503)
+        finally:
+            slots.release()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+#! /usr/bin/python3
+from sys import getsizeof
+import unittest
+
+import aco
+import sizing
+from test_aco import build_grid
+
+
+class Slotted:
+    __slots__ = ['payload']
+
+    def __init__(self, payload):
+        self.payload = payload
+
+
+class TestTotalSize(unittest.TestCase):
+    def test_follows_slots(self):
+        payload = list(range(1000))
+        self.assertGreaterEqual(sizing.total_size(Slotted(payload)), sizing.total_size(payload))
+
+    def test_exclude(self):
+        payload = list(range(1000))
+        self.assertEqual(sizing.total_size(Slotted(payload), exclude=[payload]), getsizeof(Slotted(None)))
+
+
+class TestEstimate(unittest.TestCase):
+    def test_exact_when_small(self):
+        self.assertEqual(sizing.estimate(iter(range(10)), 10, lambda i: i, sample=10), 45)
+
+    def test_scales_up_a_sample(self):
+        self.assertEqual(sizing.estimate(iter([2]*1000), 1000, lambda i: i, sample=10), 2000)
+
+
+class TestMemoryReport(unittest.TestCase):
+    def test_parts(self):
+        swarm = aco.Swarm(5, 20, 10, 1, 1, 0.75, aco.BasicAnt, 1)
+        graph = swarm(build_grid(), [(0, 0)], 1)
+        report = dict(sizing.memory_report(graph, swarm.trail, swarm.ants))
+        self.assertEqual(set(report), {'graph nodes', 'graph adjacency', 'graph edges', 'edge node ids', 'pheromone trail', 'ants'})
+        self.assertEqual(report['edge node ids'], 0)
+        self.assertGreater(report['ants'], 0)
+        # the trail is counted once, not with every edge
+        self.assertLess(report['graph edges'], len(swarm.trail)*getsizeof(swarm.trail.levels))
+
+
+if __name__ == '__main__':
+    unittest.main()
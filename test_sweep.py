@@ -0,0 +1,45 @@
+#! /usr/bin/python3
+from random import Random
+import unittest
+
+import batch
+import sweep
+from test_aco import build_grid
+
+
+class TestCombinations(unittest.TestCase):
+    def test_grid(self):
+        combinations = sweep.grid({'alpha': [1, 2], 'beta': [3], 'size': [4, 5]})
+        self.assertEqual(len(combinations), 4)
+        self.assertIn({'alpha': 2, 'beta': 3, 'size': 4}, combinations)
+
+    def test_grid_rejects_ranges(self):
+        self.assertRaises(ValueError, sweep.grid, {'alpha': (1.0, 2.0)})
+
+    def test_random_combinations(self):
+        combinations = sweep.random_combinations({'alpha': (1.0, 2.0), 'size': (10, 20), 'update': ['all']}, 5, Random(1))
+        self.assertEqual(len(combinations), 5)
+        for c in combinations:
+            self.assertTrue(1 <= c['alpha'] <= 2)
+            self.assertTrue(10 <= c['size'] <= 20)
+            self.assertIsInstance(c['size'], int)
+            self.assertEqual(c['update'], 'all')
+
+
+class TestSweep(unittest.TestCase):
+    def test_summary_per_combination(self):
+        searcher = batch.BatchSearch(build_grid(), 2)
+        try:
+            rows = sweep.sweep(searcher, [{'alpha': 1.0}, {'alpha': 2.0}], 2, 1,
+                               start=(0, 0), max_distance=20, size=5, rest=10, generations=3)
+        finally:
+            searcher.close()
+        self.assertEqual([r['alpha'] for r in rows], [1.0, 2.0])
+        for row in rows:
+            self.assertEqual(row['runs'], 2)
+            self.assertEqual(row['mean generations'], 3)
+            self.assertGreaterEqual(row['best score'], row['mean score'])
+
+
+if __name__ == '__main__':
+    unittest.main()
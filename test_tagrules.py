@@ -0,0 +1,59 @@
+#! /usr/bin/python3
+import pickle
+import unittest
+import xml.sax
+
+import osm
+import tagrules
+
+
+class TestTagRules(unittest.TestCase):
+    def test_defaults(self):
+        rules = tagrules.TagRules()
+        self.assertEqual(rules.classify({}), (0, False, False, False))
+        self.assertEqual(rules.classify({'highway': 'primary'}), (0, False, True, False))
+        self.assertEqual(rules.classify({'highway': 'primary', 'visible': 'false'}), (0, False, False, True))
+        self.assertEqual(rules.classify({'highway': 'footway', 'cycleway': 'lane'}), (0, False, True, False))
+        self.assertEqual(rules.classify({'cycleway': ''}), (0, False, False, False))
+        self.assertEqual(rules.classify({'tourism': 'hostel'}), (1, True, False, False))
+        self.assertEqual(rules.classify({'building': 'hotel'}), (1, True, False, False))
+        self.assertEqual(rules.classify({'building': 'shed'}), (0, False, False, False))
+
+    def test_weights(self):
+        rules = tagrules.TagRules({'interest': {'historic': 3, 'building': {'church': 2}},
+                                   'rest': {'amenity': 'cafe'}})
+        self.assertEqual(rules.classify({'historic': 'castle', 'building': 'church'}), (3, False, False, False))
+        self.assertEqual(rules.classify({'building': 'church', 'amenity': 'cafe'}), (2, True, False, False))
+        self.assertEqual(rules.classify({'highway': 'primary'}), (0, False, False, False))
+
+    def test_unknown_category(self):
+        with self.assertRaises(ValueError):
+            tagrules.TagRules({'scenery': {'natural': tagrules.ANY}})
+
+    def test_match_values_are_checked(self):
+        for match in (True, None, 2.5, ('path', 3), {'church': 'high'}):
+            with self.assertRaises(ValueError):
+                tagrules.TagRules({'route': {'highway': match}})
+        with self.assertRaises(ValueError):
+            tagrules.TagRules({'interest': {'building': {'church': True}}})
+
+    def test_pickles(self):
+        rules = pickle.loads(pickle.dumps(tagrules.TagRules({'route': {'highway': ('path',)}})))
+        self.assertTrue(rules.classify({'highway': 'path'})[2])
+
+    def test_used_by_nodes(self):
+        node = osm.Node(1, 2, 3)
+        node.apply_tags({'leisure': 'park', 'highway': 'path'}, tagrules.TagRules({'interest': {'leisure': 2},
+                                                                                  'route': {'highway': ('path',)}}))
+        self.assertEqual((node.interest, node.rest, node.way), (2, False, True))
+
+    def test_closed_nodes_are_left_out(self):
+        document = (b'<osm><node id="1" lat="1" lon="2"><tag k="access" v="no"/></node>'
+                    b'<node id="2" lat="1" lon="3"><tag k="tourism" v="hostel"/></node></osm>')
+        handler = osm.ExtractHandler(tagrules.TagRules({'closed': {'access': ('no',)}}))
+        xml.sax.parseString(document, handler)
+        self.assertEqual([row[0] for row in handler.nodes], [2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#! /usr/bin/python3
+import unittest
+
+import aco
+from test_aco import build_grid
+try:
+    import numpy
+    import vector
+except ImportError:
+    vector = None
+
+
+@unittest.skipIf(vector is None, "needs NumPy")
+class TestCSRGraph(unittest.TestCase):
+    def test_edges_grouped_by_node(self):
+        graph = aco.Swarm(5, 20, 10, 1, 1, 0.75, aco.BasicAnt).setup_graph(build_grid())
+        csr = vector.CSRGraph(graph)
+        for i, nid in enumerate(csr.nodes):
+            edges = slice(csr.offsets[i], csr.offsets[i+1])
+            self.assertEqual([csr.nodes[t] for t in csr.targets[edges]], [to for to, _ in graph.get_edges(nid)])
+            self.assertEqual(list(csr.eids[edges]), [e.eid for _, e in graph.get_edges(nid)])
+
+
+@unittest.skipIf(vector is None, "needs NumPy")
+class TestVectorSwarm(unittest.TestCase):
+    def build_swarm(self, seed=4):
+        return vector.VectorSwarm(20, 20, 10, 1, 1, 0.75, aco.BasicAnt, seed)
+
+    def test_routes_follow_the_graph_without_loops(self):
+        swarm = self.build_swarm()
+        graph = swarm.setup_graph(build_grid())
+        for ant in swarm.run_generation(graph, [(0, 0), (5, 5)]):
+            self.assertIn(ant.moves[0], [(0, 0), (5, 5)])
+            self.assertEqual(len(set(ant.moves)), len(ant.moves))
+            self.assertEqual(len(ant.edges), len(ant.moves)-1)
+            for (a, b), eid in zip(ant, ant.edges):
+                self.assertIn(eid, [e.eid for _, e in graph.get_edges(a)])
+                self.assertIn(b, [to for to, e in graph.get_edges(a) if e.eid == eid])
+            self.assertAlmostEqual(ant.age, sum(graph.get_edges(a, b)[0].cost_out for a, b in ant))
+
+    def test_walks_stop_once_too_old(self):
+        swarm = self.build_swarm()
+        swarm.max_tiredness = 100
+        swarm.setup_graph(build_grid())
+        csr = swarm.csr
+        starts = numpy.zeros(10, dtype=numpy.int64)
+        trace = swarm.walk(starts, swarm.local, numpy.random.default_rng(1))
+        for k in range(len(starts)):
+            path = trace[:, k][trace[:, k] >= 0]
+            self.assertLess(csr.cost[path[:-1]].sum(), swarm.max_age)
+            self.assertGreaterEqual(csr.cost[path].sum(), swarm.max_age)
+
+    def test_repeatable(self):
+        first = self.build_swarm()
+        first(build_grid(), [(0, 0)], 3)
+        second = self.build_swarm()
+        second(build_grid(), [(0, 0)], 3)
+        self.assertEqual(first.best.moves, second.best.moves)
+        self.assertEqual(list(first.trail.levels), list(second.trail.levels))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+""" Run every ant of a generation in lockstep with NumPy
+
+    The graph is flattened once per search into compressed sparse rows: the
+    edges leaving each node are a contiguous slice of flat arrays of
+    targets, lengths and interests. Each step then moves every ant still
+    walking at once, weighting the choices of all of them together and
+    picking with one roll each, so the cost of a step barely grows with the
+    size of the swarm.
+
+    Ants weight and take their choices as BasicAnt does, drawing from one
+    stream per generation rather than one per ant, so routes follow the same
+    distribution as a Swarm of BasicAnts but not the same routes for a seed.
+"""
+from time import perf_counter
+
+import numpy as np
+
+from aco import Swarm, ant_random
+
+
+class CSRGraph:
+    """ The edges of a graph as flat arrays, grouped by the node they leave
+
+        nodes       the ids of the nodes, the rest refer to nodes by position
+        offsets     the edges leaving node i are offsets[i]:offsets[i+1]
+        targets     the node each edge leads to
+        eids        the id of each edge in the pheromone trail
+        cost        the length of each edge
+        gain        the interest an ant collects taking each edge, that of
+                    the edge and the node it leaves
+        rest        whether an ant can rest on or at the end of each edge
+        local       1+the interest of each edge and the node it leads to,
+                    +1 if the ant can rest, as in BasicAnt.evaluate_edge
+    """
+    def __init__(self, graph):
+        self.nodes = list(graph)
+        index = {nid: i for i, nid in enumerate(self.nodes)}
+        offsets, targets, eids, cost, gain, rest, local = [0], [], [], [], [], [], []
+        for nid in self.nodes:
+            here = graph[nid]
+            for to, edge in graph.get_edges(nid):
+                there = graph[to]
+                rests = bool(edge.rest or there.rest)
+                targets.append(index[to])
+                eids.append(edge.eid)
+                cost.append(edge.cost_out)
+                gain.append(edge.interest+here.interest)
+                rest.append(rests)
+                local.append(1+there.interest+edge.interest+(1 if rests else 0))
+            offsets.append(len(targets))
+        self.index = index
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.targets = np.array(targets, dtype=np.int64)
+        self.eids = np.array(eids, dtype=np.int64)
+        self.cost = np.array(cost, dtype=float)
+        self.gain = np.array(gain, dtype=float)
+        self.rest = np.array(rest, dtype=bool)
+        self.local = np.array(local, dtype=float)
+        # ids can be tuples, which np.array would spread into extra dimensions
+        self.ids = np.empty(len(self.nodes), dtype=object)
+        self.ids[:] = self.nodes
+
+
+class VectorSwarm(Swarm):
+    """ A swarm that moves all the ants of a generation together
+
+        Ant must keep its route as BasicAnt does, in moves, edges, distances
+        and interests, and weight edges with BasicAnt.evaluate_edge.
+    """
+    def setup_graph(self, graph):
+        graph = super().setup_graph(graph)
+        self.csr = CSRGraph(graph)
+        self.local = self.csr.local**self.beta
+        return graph
+
+    def run_generation(self, graph, starting_points):
+        """ Run a single generation of ants over this graph """
+        csr = self.csr
+        generation, self.generation = self.generation, self.generation+1
+        rng = np.random.default_rng(ant_random(self.seed, generation, 'vector').randrange(2**63))
+        weights = np.array(self.trail.levels)[csr.eids]**self.alpha*self.local
+        population = self.population()
+        count = len(population)
+        starts = np.array([csr.index[n] for n in starting_points], dtype=np.int64)[rng.integers(len(starting_points), size=count)]
+        started = perf_counter()
+        trace = self.walk(starts, weights, rng)
+        walked = perf_counter()
+        self.timings['travel'] += walked-started
+        self.steps += int((trace >= 0).sum())
+        routes = list(self.erase_loops(starts, trace))
+        self.timings['simplify'] += perf_counter()-walked
+        for (ant, _), (start, moves, edges) in zip(population, routes):
+            ant.reset(csr.nodes[start])
+            del ant.moves[:]
+            ant.moves.extend(csr.ids[moves].tolist())
+            ant.edges.extend(csr.eids[edges].tolist())
+            ant.age, ant.interest = float(csr.cost[edges].sum()), float(csr.gain[edges].sum())
+            yield ant
+
+    def walk(self, starts, weights, rng):
+        """ Move ants from starts until every one is too tired or stuck
+
+            returns the edges taken as a (steps, ants) array, each ant's
+            column padded with -1 once it has stopped
+        """
+        csr = self.csr
+        count = len(starts)
+        here, last = starts.copy(), np.full(count, -1, dtype=np.int64)
+        age, tiredness = np.zeros(count), np.zeros(count)
+        walking = np.flatnonzero((age < self.max_age) & (tiredness < self.max_tiredness))
+        trace = []
+        while len(walking):
+            current = here[walking]
+            first = csr.offsets[current]
+            degree = csr.offsets[current+1]-first
+            if not degree.any():
+                break
+            # one column per choice, as wide as the busiest node any ant is at
+            column = np.arange(degree.max())
+            exists = column < degree[:, None]
+            edge = np.where(exists, first[:, None]+column, 0)
+            choice = exists & (csr.targets[edge] != last[walking][:, None])
+            cumulative = np.cumsum(np.where(choice, weights[edge], 0), axis=1)
+            roll = rng.random(len(walking))*cumulative[:, -1]
+            beyond = choice & (cumulative > roll[:, None])
+            # rounding can leave a roll at the total, which takes the last choice
+            last_choice = len(column)-1-np.argmax(choice[:, ::-1], axis=1)
+            picked = np.where(beyond.any(axis=1), np.argmax(beyond, axis=1), last_choice)
+            moves = choice.any(axis=1)
+            moving, taken = walking[moves], edge[moves, picked[moves]]
+            step = np.full(count, -1, dtype=np.int64)
+            step[moving] = taken
+            trace.append(step)
+            age[moving] += csr.cost[taken]
+            tiredness[moving] = np.where(csr.rest[taken], 0, tiredness[moving]+csr.cost[taken])
+            last[moving], here[moving] = here[moving], csr.targets[taken]
+            walking = moving[(age[moving] < self.max_age) & (tiredness[moving] < self.max_tiredness)]
+        return np.array(trace).reshape(len(trace), count)
+
+    def erase_loops(self, starts, trace):
+        """ Take the loops out of every walk in trace, as aco.erase_loops
+
+            The last visit of every ant to every node is found with one sort
+            of the whole generation, leaving only the jumps along each
+            loop-free route to make one at a time.
+
+            yields (start, nodes, edges) for each ant, the nodes and edges of
+            its loop-free route as positions in the CSR graph
+        """
+        csr = self.csr
+        count = len(starts)
+        taken = trace.T >= 0
+        walks = np.full((count, len(trace)+1), -1, dtype=np.int64)
+        walks[:, 0] = starts
+        walks[:, 1:][taken] = csr.targets[trace.T[taken]]
+        edges = np.full(walks.shape, -1, dtype=np.int64)
+        edges[:, :-1] = trace.T
+        visited = walks >= 0
+        nodes, edges = walks[visited], edges[visited]
+        ends = np.cumsum(visited.sum(axis=1))
+        # group the visits of each ant to each node together, in order
+        key = np.repeat(np.arange(count), visited.sum(axis=1))*len(csr.nodes)+nodes
+        order = np.argsort(key, kind='stable')
+        group_ends = np.flatnonzero(np.diff(key[order], append=-1))
+        last_visit = np.empty(len(nodes), dtype=np.int64)
+        last_visit[order] = np.repeat(order[group_ends], np.diff(group_ends, prepend=-1))
+        # jump along every route at once, one kept node of each per row
+        position, rows = ends-visited.sum(axis=1), []
+        while True:
+            on_route = position < ends
+            if not on_route.any():
+                break
+            rows.append(np.where(on_route, position, -1))
+            position = np.where(on_route, last_visit[np.minimum(position, len(nodes)-1)]+1, position)
+        kept = np.array(rows).T
+        for ant in range(count):
+            route = kept[ant][kept[ant] >= 0]
+            yield starts[ant], nodes[route], edges[last_visit[route[:-1]]]